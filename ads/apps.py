@@ -6,6 +6,8 @@ class AdsConfig(AppConfig):
     name = 'ads'
 
     def ready(self):
+        import ads.signals  # noqa
+        import ads.uploads  # noqa  (registers the image job handler)
         try:
             import ads.templatetags.ads_extras  # noqa
         except ImportError:
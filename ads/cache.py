@@ -0,0 +1,147 @@
+import hashlib
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.contrib import messages
+from django.core.cache import cache, caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.http import HttpResponse
+from django.middleware.csrf import get_token
+
+# Rendered into cached pages in place of the visitor's CSRF token and swapped
+# for a fresh token on every response, so one visitor's token is never served
+# to another. See ads.context_processors.listing_cache.
+CSRF_PLACEHOLDER = '__listing_cache_csrf_token__'
+
+NAMESPACE_KEY_PREFIX = 'listing-cache-ns'
+PAGE_KEY_PREFIX = 'listing-cache-page'
+
+
+def listing_namespaces(vehicle_type=None, make=None):
+    """
+    Return the invalidation namespaces a listing page depends on.
+
+    A page filtered by type only changes when a vehicle of that type changes,
+    likewise for make. Anything else depends on the catch-all namespace.
+    """
+    if vehicle_type:
+        return [f'type:{vehicle_type.lower()}']
+    if make:
+        return [f'make:{make.lower()}']
+    return ['all']
+
+
+def _namespace_key(namespace):
+    # Hash so user-supplied makes are always valid cache keys
+    return f'{NAMESPACE_KEY_PREFIX}:{hashlib.md5(namespace.encode()).hexdigest()}'
+
+
+def _new_version():
+    # Time-based so a namespace evicted from the cache never reuses an old version
+    return int(time.time() * 1000)
+
+
+def get_namespace_versions(namespaces):
+    """Return the current version of each namespace, creating missing ones."""
+    keys = [_namespace_key(namespace) for namespace in namespaces]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            cache.add(key, _new_version(), None)
+            versions[key] = cache.get(key)
+    return [versions[key] for key in keys]
+
+
+def bump_namespaces(namespaces):
+    """Invalidate every cached page that depends on any of ``namespaces``."""
+    for namespace in set(namespaces):
+        key = _namespace_key(namespace)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, _new_version(), None)
+
+
+def invalidate_vehicle_listings(*vehicles):
+    """
+    Invalidate the cached pages that could show vehicles with the given
+    ``(vehicle_type, make)`` pairs.
+    """
+    namespaces = ['all']
+    for vehicle_type, make in vehicles:
+        if vehicle_type:
+            namespaces.append(f'type:{vehicle_type.lower()}')
+        if make:
+            namespaces.append(f'make:{make.lower()}')
+    bump_namespaces(namespaces)
+
+
+def page_cache_key(request, namespaces):
+    """Build the cache key for a page from its path, normalized GET and namespace versions."""
+    query = sorted(
+        (key, value.strip())
+        for key, values in request.GET.lists()
+        for value in values
+        if value.strip()
+    )
+    versions = get_namespace_versions(namespaces)
+    raw = repr((request.path, query, list(zip(namespaces, versions))))
+    return f'{PAGE_KEY_PREFIX}:{hashlib.sha1(raw.encode()).hexdigest()}'
+
+
+def cache_is_shared():
+    """
+    True if every worker process sees the same cache.
+
+    Invalidation bumps namespace versions stored in the cache, so with a
+    process-local backend such as LocMemCache a change made in one worker
+    (or in a management command) only reaches the pages cached by the others
+    when their entries time out after LISTING_CACHE_TIMEOUT.
+    """
+    return not isinstance(caches['default'], LocMemCache)
+
+
+def _is_cacheable(request):
+    if not settings.LISTING_CACHE_ENABLED:
+        return False
+    if request.method not in ('GET', 'HEAD'):
+        return False
+    if request.user.is_authenticated:
+        return False
+    # Pages carrying a flash message are specific to this visitor
+    return len(messages.get_messages(request)) == 0
+
+
+def cache_listing_page(get_namespaces):
+    """
+    Cache a public listing view for anonymous visitors.
+
+    ``get_namespaces`` receives the view arguments and returns the namespaces
+    the page depends on (see listing_namespaces). Entries expire after
+    LISTING_CACHE_TIMEOUT seconds or as soon as a namespace is bumped (in
+    every worker only with a shared backend, see cache_is_shared).
+    Nothing is cached when LISTING_CACHE_ENABLED is off.
+    """
+    def decorator(view_func):
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            if not _is_cacheable(request):
+                return view_func(request, *args, **kwargs)
+
+            key = page_cache_key(request, get_namespaces(request, *args, **kwargs))
+            content = cache.get(key)
+            if content is None:
+                request.listing_cache_render = True
+                try:
+                    response = view_func(request, *args, **kwargs)
+                finally:
+                    request.listing_cache_render = False
+                if response.status_code != 200 or response.streaming:
+                    return response
+                content = response.content.decode(response.charset)
+                cache.set(key, content, settings.LISTING_CACHE_TIMEOUT)
+
+            return HttpResponse(content.replace(CSRF_PLACEHOLDER, get_token(request)))
+        return wrapper
+    return decorator
@@ -0,0 +1,58 @@
+from .images import build_srcset, variant_url
+from .models import Favorite, VehicleImage
+
+
+def load_card_context(vehicles, user=None):
+    """
+    Attach everything a vehicle card needs to a page of vehicles.
+
+    Sets ``cover_image_url`` (URL of the first image's card-sized JPEG, or of
+    the original upload before derivatives exist, or None), the
+    ``cover_webp_srcset``/``cover_jpeg_srcset`` candidates, ``image_status``
+    ('failed' or 'pending' while an upload job has not succeeded, otherwise
+    'ready') and ``is_favorite`` on each vehicle using one query for the images and one for
+    the user's favorites, however many cards are on the page. Returns the
+    vehicles as a list so callers can hand it straight to a template.
+    """
+    vehicles = list(vehicles)
+    if not vehicles:
+        return vehicles
+
+    vehicle_ids = [vehicle.id for vehicle in vehicles]
+
+    # The first uploaded image by id is the cover, matching vehicle.images.first
+    storage = VehicleImage._meta.get_field('image').storage
+    cover_images = {}
+    image_statuses = {}
+    image_rows = VehicleImage.objects.filter(
+        vehicle_id__in=vehicle_ids
+    ).order_by('vehicle_id', 'id').values_list('vehicle_id', 'image', 'variants', 'status')
+    for vehicle_id, image_name, variants, status in image_rows:
+        image_statuses.setdefault(vehicle_id, set()).add(status)
+        if vehicle_id in cover_images or not image_name:
+            continue
+        cover_images[vehicle_id] = (
+            variant_url(variants, 'card', 'jpeg', storage) or storage.url(image_name),
+            build_srcset(variants, 'webp', storage),
+            build_srcset(variants, 'jpeg', storage),
+        )
+
+    favorite_ids = set()
+    if user is not None and user.is_authenticated:
+        favorite_ids = set(Favorite.objects.filter(
+            user=user, vehicle_id__in=vehicle_ids
+        ).values_list('vehicle_id', flat=True))
+
+    for vehicle in vehicles:
+        (
+            vehicle.cover_image_url,
+            vehicle.cover_webp_srcset,
+            vehicle.cover_jpeg_srcset,
+        ) = cover_images.get(vehicle.id, (None, '', ''))
+        statuses = image_statuses.get(vehicle.id, ())
+        vehicle.image_status = next(
+            (status for status in ('failed', 'pending') if status in statuses), 'ready'
+        )
+        vehicle.is_favorite = vehicle.id in favorite_ids
+
+    return vehicles
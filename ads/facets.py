@@ -0,0 +1,184 @@
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import BooleanField, Case, ExpressionWrapper, IntegerField, Value, When
+from django.db.models.functions import Lower
+
+from .cache import get_namespace_versions, listing_namespaces
+from .forms import VehicleForm
+from .models import Vehicle
+from .search import FACET_FIELDS, SEARCH_FIELDS, facet_conditions, filter_vehicles
+
+FACET_KEY_PREFIX = 'search-facets'
+
+# (lower bound, upper bound) in rupees; None means open-ended
+PRICE_BUCKETS = (
+    (None, 1_000_000),
+    (1_000_000, 2_500_000),
+    (2_500_000, 5_000_000),
+    (5_000_000, 10_000_000),
+    (10_000_000, 20_000_000),
+    (20_000_000, None),
+)
+
+# Facet name -> column of the grouped subquery, in GROUPING() argument order
+_FACET_COLUMNS = (
+    ('vehicle_type', 'vehicle_type'),
+    ('make', 'facet_make'),
+    ('fuel', 'fuel_type'),
+    ('condition', 'condition'),
+    ('price', 'price_bucket'),
+)
+
+_FACET_LABELS = {
+    'vehicle_type': dict(VehicleForm.VEHICLE_TYPES),
+    'make': dict(VehicleForm.VEHICLE_MAKES),
+    'fuel': dict(Vehicle.FUEL_CHOICES),
+    'condition': dict(Vehicle.CONDITION_CHOICES),
+}
+
+
+def _rupees(amount):
+    if amount >= 1_000_000:
+        return f'{amount / 1_000_000:g}M'
+    return f'{amount:,}'
+
+
+def price_bucket_label(low, high):
+    if low is None:
+        return f'Under Rs. {_rupees(high)}'
+    if high is None:
+        return f'Over Rs. {_rupees(low)}'
+    return f'Rs. {_rupees(low)} - {_rupees(high)}'
+
+
+def _price_bucket():
+    whens = [
+        When(price__lt=high, then=Value(index))
+        for index, (_, high) in enumerate(PRICE_BUCKETS)
+        if high is not None
+    ]
+    return Case(*whens, default=Value(len(PRICE_BUCKETS) - 1), output_field=IntegerField())
+
+
+def count_facets(params):
+    """
+    Count the vehicles matching ``params`` per vehicle type, make, fuel type,
+    condition and price bucket.
+
+    Each facet is counted with every filter except its own, so after picking
+    a make the other makes still show how many ads switching would find.
+    All five facets come from one GROUPING SETS query: the facet filters are
+    selected as flags instead of applied, and every grouping set reads the
+    COUNT(*) FILTER that leaves out its own flag. Returns
+    ``{facet: {value: count}}``; price buckets are keyed by index into
+    PRICE_BUCKETS.
+    """
+    conditions = facet_conditions(params)
+    flags = {
+        f'matches_{name}': ExpressionWrapper(condition, output_field=BooleanField())
+        for name, condition in conditions.items()
+    }
+    inner = filter_vehicles({**params, **dict.fromkeys(FACET_FIELDS)}).order_by().annotate(
+        facet_make=Lower('make'),
+        price_bucket=_price_bucket(),
+        **flags,
+    ).values(*[column for _, column in _FACET_COLUMNS], *flags)
+    inner_sql, sql_params = inner.query.sql_with_params()
+
+    counts_sql = []
+    for name, _ in _FACET_COLUMNS:
+        others = [f'matches_{other}' for other in conditions if other != name]
+        counts_sql.append(f'COUNT(*) FILTER (WHERE {" AND ".join(others)})' if others else 'COUNT(*)')
+
+    columns = ', '.join(column for _, column in _FACET_COLUMNS)
+    grouping_sets = ', '.join(f'({column})' for _, column in _FACET_COLUMNS)
+    sql = (
+        f'SELECT {columns}, GROUPING({columns}), {", ".join(counts_sql)} '
+        f'FROM ({inner_sql}) AS facet_rows '
+        f'GROUP BY GROUPING SETS ({grouping_sets})'
+    )
+
+    # GROUPING() sets a bit for every column not grouped in the row's set
+    all_bits = (1 << len(_FACET_COLUMNS)) - 1
+    facet_by_mask = {
+        all_bits ^ (1 << (len(_FACET_COLUMNS) - 1 - position)): (position, name)
+        for position, (name, _) in enumerate(_FACET_COLUMNS)
+    }
+
+    counts = {name: {} for name, _ in _FACET_COLUMNS}
+    with connection.cursor() as cursor:
+        cursor.execute(sql, sql_params)
+        for row in cursor.fetchall():
+            values = row[:len(_FACET_COLUMNS)]
+            mask = row[len(_FACET_COLUMNS)]
+            position, name = facet_by_mask[mask]
+            value = values[position]
+            count = row[len(_FACET_COLUMNS) + 1 + position]
+            if value not in (None, '') and count:
+                counts[name][value] = count
+    return counts
+
+
+def _options(name, counts, selected):
+    """Every known choice for a facet, plus any other stored value, with counts."""
+    labels = _FACET_LABELS[name]
+    options = [
+        {'value': value, 'label': label, 'count': counts.get(value, 0), 'selected': value == selected}
+        for value, label in labels.items()
+        if value
+    ]
+    known = set(labels)
+    for value, count in sorted(counts.items(), key=lambda item: -item[1]):
+        if value not in known:
+            options.append({'value': value, 'label': value.title(), 'count': count, 'selected': value == selected})
+    return options
+
+
+def facet_cache_key(params):
+    signature = sorted(
+        (field, str(params[field]).strip().lower())
+        for field in SEARCH_FIELDS
+        if params.get(field) and str(params[field]).strip() not in ('', 'any')
+    )
+    versions = get_namespace_versions(listing_namespaces(params.get('type'), params.get('make')))
+    raw = repr((signature, versions))
+    return f'{FACET_KEY_PREFIX}:{hashlib.sha1(raw.encode()).hexdigest()}'
+
+
+def get_facets(params):
+    """
+    Return the facet options for the search filter, cached per filter set.
+
+    Entries live for FACET_CACHE_TIMEOUT seconds and are dropped as soon as
+    the listing cache namespaces they depend on are bumped.
+    """
+    key = facet_cache_key(params)
+    counts = cache.get(key)
+    if counts is None:
+        counts = count_facets(params)
+        cache.set(key, counts, settings.FACET_CACHE_TIMEOUT)
+
+    selected = {
+        'vehicle_type': (params.get('type') or '').lower(),
+        'make': (params.get('make') or '').lower(),
+        'fuel': params.get('fuel') or '',
+        'condition': params.get('condition') or '',
+    }
+    facets = {
+        name: _options(name, counts[name], selected[name])
+        for name in ('vehicle_type', 'make', 'fuel', 'condition')
+    }
+    facets['price'] = [
+        {
+            'label': price_bucket_label(low, high),
+            'min_price': low or '',
+            # max_price is inclusive, bucket upper bounds are not
+            'max_price': high - 1 if high else '',
+            'count': counts['price'].get(index, 0),
+        }
+        for index, (low, high) in enumerate(PRICE_BUCKETS)
+    ]
+    return facets
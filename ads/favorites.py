@@ -0,0 +1,79 @@
+from django.db import connection
+from django.utils import timezone
+
+from .models import Favorite, Vehicle
+
+
+def _tables():
+    qn = connection.ops.quote_name
+    return qn(Favorite._meta.db_table), qn(Vehicle._meta.db_table)
+
+
+# Each statement changes the Favorite row and Vehicle.favorite_count together
+# and reads back the count. The final SELECT sees the vehicle row as it was
+# before the statement, so the updated count comes from the CTE when a row
+# changed. It returns no row when the vehicle does not exist.
+_ADD_SQL = '''
+    WITH added AS (
+        INSERT INTO {favorite} (user_id, vehicle_id, created_at)
+        SELECT %s, id, %s FROM {vehicle} WHERE id = %s
+        ON CONFLICT (user_id, vehicle_id) DO NOTHING
+        RETURNING vehicle_id
+    ), counted AS (
+        UPDATE {vehicle} SET favorite_count = favorite_count + 1
+        WHERE id IN (SELECT vehicle_id FROM added)
+        RETURNING favorite_count
+    )
+    SELECT EXISTS (SELECT 1 FROM added),
+           COALESCE((SELECT favorite_count FROM counted), favorite_count)
+    FROM {vehicle} WHERE id = %s
+'''
+
+_REMOVE_SQL = '''
+    WITH removed AS (
+        DELETE FROM {favorite} WHERE user_id = %s AND vehicle_id = %s
+        RETURNING vehicle_id
+    ), counted AS (
+        UPDATE {vehicle} SET favorite_count = GREATEST(favorite_count - 1, 0)
+        WHERE id IN (SELECT vehicle_id FROM removed)
+        RETURNING favorite_count
+    )
+    SELECT EXISTS (SELECT 1 FROM removed),
+           COALESCE((SELECT favorite_count FROM counted), favorite_count)
+    FROM {vehicle} WHERE id = %s
+'''
+
+
+def _execute(sql, params):
+    favorite, vehicle = _tables()
+    with connection.cursor() as cursor:
+        cursor.execute(sql.format(favorite=favorite, vehicle=vehicle), params)
+        return cursor.fetchone()
+
+
+def set_favorite(user_id, vehicle_id, is_favorite=None):
+    """
+    Add or remove ``vehicle_id`` from the user's favorites in one statement.
+
+    Setting the state the favorite is already in changes nothing, so repeated
+    requests (a double-tapped heart) are harmless. With ``is_favorite=None``
+    the current state is flipped. Returns ``(is_favorite, favorite_count)``,
+    or None when the vehicle does not exist.
+    """
+    if is_favorite is None:
+        # Try to add first; if the favorite was already there, remove it
+        row = _execute(_ADD_SQL, [user_id, timezone.now(), vehicle_id, vehicle_id])
+        if row is None:
+            return None
+        if row[0]:
+            is_favorite = True
+        else:
+            row = _execute(_REMOVE_SQL, [user_id, vehicle_id, vehicle_id])
+            is_favorite = False
+    elif is_favorite:
+        row = _execute(_ADD_SQL, [user_id, timezone.now(), vehicle_id, vehicle_id])
+    else:
+        row = _execute(_REMOVE_SQL, [user_id, vehicle_id, vehicle_id])
+    if row is None:
+        return None
+    return bool(is_favorite), row[1]
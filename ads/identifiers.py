@@ -0,0 +1,74 @@
+import threading
+
+from django.db import DEFAULT_DB_ALIAS, connections
+
+# Numbers handed out per nextval() call. Must not change once in production:
+# the blocks of different sizes would overlap.
+ID_BLOCK_SIZE = 20
+
+# Allocation numbers are scattered over the id space with n * MULTIPLIER mod
+# space, a bijection as long as MULTIPLIER shares no factor with the space
+# (2, 3 and 5 for the spaces used here). Ids stay unguessable in order, but
+# every number maps to a distinct id.
+MULTIPLIER = 387433
+
+# Attempts before giving up when allocated ids keep colliding, e.g. with the
+# random ids of older rows or once the space is exhausted
+MAX_ATTEMPTS = 10
+
+
+class IdentifierSpaceExhausted(RuntimeError):
+    """Every number of an allocator's space has been handed out."""
+
+
+class IdentifierAllocator:
+    """
+    Hand out distinct numbers in ``range(low, low + space)`` from a database
+    sequence.
+
+    Each nextval() reserves a block of ID_BLOCK_SIZE numbers for this process,
+    so most allocations run no query at all. Blocks are taken from the
+    sequence of the database the row is saved to, one cached block per
+    database alias. The unused rest of a block is lost when the process
+    exits, and nextval() is never rolled back, so ids have gaps; that is
+    accepted, they only need to be distinct. A number can still collide with
+    a row created before the allocator existed; callers rely on the unique
+    constraint and call ``next()`` again (see ``is_unique_violation``).
+    Once the sequence has passed the last block of the space, ``next()``
+    raises IdentifierSpaceExhausted instead of reusing numbers.
+    """
+
+    def __init__(self, sequence, low, space):
+        self.sequence = sequence
+        self.low = low
+        self.space = space
+        self._lock = threading.Lock()
+        # Database alias -> [next number, end of the block]
+        self._blocks = {}
+
+    def next(self, using=None):
+        using = using or DEFAULT_DB_ALIAS
+        with self._lock:
+            block_range = self._blocks.setdefault(using, [0, 0])
+            if block_range[0] >= block_range[1]:
+                with connections[using].cursor() as cursor:
+                    cursor.execute('SELECT nextval(%s)', [self.sequence])
+                    block = cursor.fetchone()[0]
+                if block >= self.space // ID_BLOCK_SIZE:
+                    raise IdentifierSpaceExhausted(
+                        f'{self.sequence} is at block {block}: the space of {self.space} ids is used up.'
+                    )
+                block_range[:] = [block * ID_BLOCK_SIZE, (block + 1) * ID_BLOCK_SIZE]
+            number = block_range[0]
+            block_range[0] += 1
+        return self.low + (number * MULTIPLIER) % self.space
+
+
+def is_unique_violation(error, *columns):
+    """True if ``error`` is a unique violation on one of ``columns``."""
+    constraint = getattr(getattr(error.__cause__, 'diag', None), 'constraint_name', None) or ''
+    return any(f'_{column}_' in constraint for column in columns)
+
+
+ad_ids = IdentifierAllocator('ads_vehicle_ad_id_seq', 0, 1_000_000)
+profile_ids = IdentifierAllocator('users_userprofile_unique_id_seq', 100_000, 900_000)
@@ -0,0 +1,103 @@
+import os
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps
+
+
+# Longest edge in pixels for each derivative, smallest first
+IMAGE_VARIANTS = (
+    ('card', 480),
+    ('gallery', 1024),
+    ('full', 1920),
+)
+
+# (format key, Pillow format, file extension, save options)
+IMAGE_FORMATS = (
+    ('webp', 'WEBP', 'webp', {'quality': 80, 'method': 6}),
+    ('jpeg', 'JPEG', 'jpg', {'quality': 82, 'optimize': True, 'progressive': True}),
+)
+
+FORMAT_KEYS = tuple(format_key for format_key, *_ in IMAGE_FORMATS)
+
+DERIVATIVES_DIR = 'vehicle_images/derivatives'
+
+
+def _encode(image, pillow_format, options):
+    buffer = BytesIO()
+    image.save(buffer, pillow_format, **options)
+    return buffer.getvalue()
+
+
+def generate_derivatives(vehicle_image, source_file=None):
+    """
+    Render every variant of ``vehicle_image.image`` in WebP and JPEG, store
+    them next to the original and record them on ``vehicle_image.variants``.
+
+    ``source_file`` is an open local copy of the image to read instead of
+    downloading it back from storage. Variants are never upscaled; a variant
+    that would be as large as the previous one is skipped. Returns the new
+    ``variants`` mapping.
+    """
+    field = vehicle_image.image
+    storage = field.storage
+    stem = os.path.splitext(os.path.basename(field.name))[0]
+
+    if source_file is None:
+        field.open('rb')
+    try:
+        with Image.open(source_file or field) as source:
+            source = ImageOps.exif_transpose(source)
+            if source.mode not in ('RGB', 'L'):
+                source = source.convert('RGB')
+            source.load()
+    finally:
+        if source_file is None:
+            field.close()
+
+    variants = {}
+    previous_width = None
+    for variant, max_edge in IMAGE_VARIANTS:
+        image = source.copy()
+        image.thumbnail((max_edge, max_edge), Image.LANCZOS)
+        if image.width == previous_width:
+            continue
+        previous_width = image.width
+
+        entry = {'width': image.width, 'height': image.height}
+        for format_key, pillow_format, extension, options in IMAGE_FORMATS:
+            name = f'{DERIVATIVES_DIR}/{stem}_{variant}.{extension}'
+            entry[format_key] = storage.save(
+                name, ContentFile(_encode(image, pillow_format, options))
+            )
+        variants[variant] = entry
+
+    # Files of a previous set are queued for deletion by the ads_vehicleimage
+    # trigger (see StorageTombstone)
+    vehicle_image.variants = variants
+    vehicle_image.save(update_fields=['variants'])
+    return variants
+
+
+def build_srcset(variants, format_key, storage):
+    """Return an ``<img srcset>`` value for one format, e.g. "a.webp 480w, b.webp 1024w"."""
+    return ', '.join(
+        f"{storage.url(entry[format_key])} {entry['width']}w"
+        for entry in sorted((variants or {}).values(), key=lambda entry: entry['width'])
+        if entry.get(format_key)
+    )
+
+
+def variant_url(variants, variant, format_key, storage):
+    """URL of one variant, falling back to the largest smaller one, or None."""
+    variants = variants or {}
+    names = [name for name, _ in IMAGE_VARIANTS]
+    for candidate in reversed(names[:names.index(variant) + 1]):
+        entry = variants.get(candidate)
+        if entry and entry.get(format_key):
+            return storage.url(entry[format_key])
+    # Nothing that small exists (the original was tiny): use the smallest
+    for entry in variants.values():
+        if entry.get(format_key):
+            return storage.url(entry[format_key])
+    return None
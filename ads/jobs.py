@@ -0,0 +1,129 @@
+import logging
+import os
+import socket
+import traceback
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+# kind -> (handler, on_failure); see register
+_handlers = {}
+
+
+def register(kind, on_failure=None):
+    """
+    Register the handler for a job kind.
+
+    The handler receives the job payload and must be safe to run more than
+    once. ``on_failure(payload, error)`` is called when the last attempt fails.
+    """
+    def decorator(handler):
+        _handlers[kind] = (handler, on_failure)
+        return handler
+    return decorator
+
+
+def enqueue(kind, idempotency_key, payload=None, run_at=None):
+    """
+    Queue ``kind`` work under ``idempotency_key`` and return the job.
+
+    Queueing a key again resets its job to pending with the new payload. A
+    worker still running the old version then leaves it pending for another
+    run instead of marking it done.
+    """
+    job, _ = Job.objects.update_or_create(
+        idempotency_key=idempotency_key,
+        defaults={
+            'kind': kind,
+            'payload': payload or {},
+            'status': 'pending',
+            'attempts': 0,
+            'max_attempts': settings.JOB_MAX_ATTEMPTS,
+            'run_at': run_at or timezone.now(),
+            'locked_by': '',
+            'locked_at': None,
+            'last_error': '',
+        },
+    )
+    return job
+
+
+def enqueue_on_commit(kind, idempotency_key, payload=None):
+    """Queue the job once the surrounding transaction has committed."""
+    transaction.on_commit(lambda: enqueue(kind, idempotency_key, payload))
+
+
+def worker_id():
+    return f'{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}'
+
+
+def claim_jobs(worker, limit):
+    """
+    Lock up to ``limit`` due jobs for ``worker`` and return them.
+
+    SKIP LOCKED lets several workers poll the table without handing out the
+    same job twice. Jobs left running by a crashed worker are picked up again
+    after JOB_LOCK_TIMEOUT seconds.
+    """
+    now = timezone.now()
+    stale = now - timedelta(seconds=settings.JOB_LOCK_TIMEOUT)
+    with transaction.atomic():
+        jobs = list(
+            Job.objects.select_for_update(skip_locked=True)
+            .filter(Q(status='pending', run_at__lte=now) | Q(status='running', locked_at__lt=stale))
+            .order_by('run_at')[:limit]
+        )
+        if jobs:
+            Job.objects.filter(pk__in=[job.pk for job in jobs]).update(
+                status='running', locked_by=worker, locked_at=now, attempts=F('attempts') + 1, updated_at=now
+            )
+    for job in jobs:
+        job.status, job.locked_by, job.locked_at = 'running', worker, now
+        job.attempts += 1
+    return jobs
+
+
+def run_job(job):
+    """Run one claimed job and record the outcome. Returns True on success."""
+    handler, on_failure = _handlers.get(job.kind, (None, None))
+    # Only the worker holding the lock may finish the job; a re-enqueue clears it
+    claimed = Job.objects.filter(pk=job.pk, status='running', locked_by=job.locked_by)
+    try:
+        if handler is None:
+            raise LookupError(f'No handler registered for job kind {job.kind!r}')
+        handler(job.payload)
+    except Exception as e:
+        logger.exception('Job %s (%s) failed on attempt %s', job.pk, job.kind, job.attempts)
+        error = traceback.format_exc()
+        if job.attempts >= job.max_attempts:
+            failed = claimed.update(
+                status='failed',
+                last_error=error,
+                locked_by='',
+                locked_at=None,
+                updated_at=timezone.now(),
+            )
+            if failed and on_failure:
+                on_failure(job.payload, e)
+        else:
+            delay = settings.JOB_RETRY_DELAY * 2 ** (job.attempts - 1)
+            claimed.update(
+                status='pending',
+                run_at=timezone.now() + timedelta(seconds=delay),
+                last_error=error,
+                locked_by='',
+                locked_at=None,
+                updated_at=timezone.now(),
+            )
+        return False
+
+    claimed.update(status='done', last_error='', locked_by='', locked_at=None, updated_at=timezone.now())
+    return True
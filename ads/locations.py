@@ -0,0 +1,53 @@
+import re
+
+# Sri Lankan provinces and their districts. The keys match the option values
+# used by the city selects ("colombo", "nuwara_eliya", "any_western", ...).
+PROVINCE_DISTRICTS = {
+    'western': ('colombo', 'gampaha', 'kalutara'),
+    'central': ('kandy', 'matale', 'nuwara_eliya'),
+    'southern': ('galle', 'matara', 'hambantota'),
+    'northern': ('jaffna', 'kilinochchi', 'mannar', 'vavuniya', 'mullaitivu'),
+    'eastern': ('batticaloa', 'ampara', 'trincomalee'),
+    'north_western': ('kurunegala', 'puttalam'),
+    'north_central': ('anuradhapura', 'polonnaruwa'),
+    'uva': ('badulla', 'monaragala'),
+    'sabaragamuwa': ('ratnapura', 'kegalle'),
+}
+
+DISTRICT_PROVINCES = {
+    district: province
+    for province, districts in PROVINCE_DISTRICTS.items()
+    for district in districts
+}
+
+# Longest first so "north_western" is matched before "western"
+_PROVINCES_BY_LENGTH = sorted(PROVINCE_DISTRICTS, key=len, reverse=True)
+
+
+def _slug(value):
+    """Lowercase and join words with underscores: "Nuwara Eliya" -> "nuwara_eliya"."""
+    return re.sub(r'[^a-z0-9]+', '_', (value or '').lower()).strip('_')
+
+
+def resolve_location(location):
+    """
+    Map a stored location to ``(district, province)``.
+
+    Handles the select values ("kandy", "any_central") as well as older
+    free-text locations such as "Colombo 07". Unknown parts are ''.
+    """
+    slug = _slug(location)
+    if not slug:
+        return '', ''
+
+    if slug.startswith('any_') and slug[4:] in PROVINCE_DISTRICTS:
+        return '', slug[4:]
+
+    padded = f'_{slug}_'
+    for district, province in DISTRICT_PROVINCES.items():
+        if f'_{district}_' in padded:
+            return district, province
+    for province in _PROVINCES_BY_LENGTH:
+        if f'_{province}_' in padded:
+            return '', province
+    return '', ''
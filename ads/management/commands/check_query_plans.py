@@ -0,0 +1,145 @@
+from datetime import timedelta
+import random
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from ads.locations import DISTRICT_PROVINCES
+from ads.models import Vehicle, normalize_model_name
+from ads.search import (
+    _keyset_filter, _ordering_keys, decode_cursor, encode_cursor, filter_vehicles, order_vehicles
+)
+
+
+class Command(BaseCommand):
+    help = 'EXPLAIN the public listing queries and fail if any of them sequentially scans ads_vehicle'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=20000,
+            help='Number of throwaway vehicles to insert before explaining (rolled back afterwards, 0 to skip)',
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('Query plans can only be checked against PostgreSQL.')
+
+        failures = []
+        with transaction.atomic():
+            self.seed(options['seed'])
+            # A fresh account, so the per-user plans match a typical seller
+            user = User.objects.create(username=f'query-plan-user-{random.randint(100000, 999999)}')
+            for label, queryset in self.public_queries(user):
+                plan = queryset.explain()
+                if 'Seq Scan on ads_vehicle' in plan:
+                    failures.append(label)
+                    self.stdout.write(self.style.ERROR(f'SEQ SCAN  {label}'))
+                    self.stdout.write(plan)
+                else:
+                    self.stdout.write(self.style.SUCCESS(f'OK        {label}'))
+            # Never keep the seeded rows
+            transaction.set_rollback(True)
+
+        if failures:
+            raise CommandError(f'{len(failures)} public queries fall back to a sequential scan: {", ".join(failures)}')
+        self.stdout.write(self.style.SUCCESS('All public queries use an index'))
+
+    def seed(self, count):
+        """Insert ``count`` vehicles spread across types, makes and statuses."""
+        if count <= 0:
+            return
+        user = User.objects.create(username=f'query-plan-seed-{random.randint(100000, 999999)}')
+
+        now = timezone.now()
+        types = ['car', 'motorcycle', 'three-wheeler', 'van', 'suv', 'pickup', 'bus', 'lorry']
+        makes = ['toyota', 'honda', 'nissan', 'suzuki', 'bmw', 'mercedes', 'audi', 'mazda']
+        models = ['Aqua', 'Prius', 'Axio', 'Premio', 'Vitz', 'Civic', 'Fit', 'Vezel', 'Grace', 'Leaf',
+                  'Sunny', 'X-Trail', 'Alto', 'Swift', 'Wagon R', '320i', 'C200', 'A4', 'Axela', 'Demio']
+        locations = ['colombo', 'gampaha', 'kalutara', 'kandy', 'matale', 'nuwara_eliya',
+                     'galle', 'matara', 'hambantota', 'kurunegala']
+        statuses = ['approved'] * 8 + ['pending', 'rejected']
+        vehicles = []
+        for index in range(count):
+            model = random.choice(models)
+            district = random.choice(locations)
+            vehicles.append(Vehicle(
+                user=user,
+                # Explicit ids keep the seed rows from using up the ad id sequence
+                ad_id=f'Q{index:06d}',
+                vehicle_type=random.choice(types),
+                make=random.choice(makes),
+                model=model,
+                # bulk_create skips Vehicle.save(), so fill the search key here
+                model_normalized=normalize_model_name(model),
+                district=district,
+                province=DISTRICT_PROVINCES[district],
+                condition='used',
+                is_urgent=random.random() < 0.02,
+                is_boosted=random.random() < 0.01,
+                phone_number='0700000000',
+                year=random.randint(1995, now.year),
+                location=district,
+                price=random.randint(100000, 50000000),
+                status=random.choice(statuses),
+            ))
+        Vehicle.objects.bulk_create(vehicles, batch_size=2000)
+
+        # created_at is auto_now_add, so spread it out afterwards for a realistic distribution
+        seeded = list(Vehicle.objects.filter(user=user).only('id', 'created_at'))
+        for vehicle in seeded:
+            vehicle.created_at = now - timedelta(minutes=random.randint(0, 60 * 24 * 365))
+        Vehicle.objects.bulk_update(seeded, ['created_at'], batch_size=2000)
+
+        with connection.cursor() as cursor:
+            # Autovacuum would normally flush the bulk insert out of the GIN
+            # pending list; until then the planner prices the index too high
+            cursor.execute("SELECT gin_clean_pending_list('vehicle_search_vector_idx')")
+            cursor.execute('ANALYZE ads_vehicle')
+
+    def public_queries(self, user):
+        page = 41
+        return [
+            ('home urgent listings',
+             Vehicle.objects.filter(status='approved', is_urgent=True).order_by('-created_at')),
+            ('search (no filters)',
+             self.ranked({})[:page]),
+            ('search by vehicle type',
+             self.ranked({'type': 'car'})[:page]),
+            ('search by make',
+             self.ranked({'make': 'Toyota'})[:page]),
+            ('search by type and make',
+             self.ranked({'type': 'car', 'make': 'toyota'})[:page]),
+            ('search by model',
+             self.ranked({'model': 'axi'})[:page]),
+            ('search by city',
+             self.ranked({'city': 'kandy'})[:page]),
+            ('search by province',
+             self.ranked({'city': 'any_southern'})[:page]),
+            ('search, later page',
+             self.later_page({'type': 'car'})),
+            ('free-text search',
+             self.ranked({'q': 'aqua kandy'})[:page]),
+            ('my ads',
+             Vehicle.objects.filter(user=user).order_by('-created_at')),
+            ('shop profile',
+             Vehicle.objects.filter(user=user, status='approved').order_by('-created_at')),
+        ]
+
+    def ranked(self, params):
+        vehicles, ordering = order_vehicles(filter_vehicles(params), params)
+        return vehicles.order_by(*ordering)
+
+    def later_page(self, params, page_size=40):
+        """The query paginate_vehicles runs for a page deep into the results."""
+        vehicles, ordering = order_vehicles(filter_vehicles(params), params)
+        last = vehicles.order_by(*ordering)[page_size * 10:page_size * 10 + 1].first()
+        if last is None:
+            return vehicles.order_by(*ordering)[:page_size + 1]
+        values, _ = decode_cursor(encode_cursor(last, ordering, 'next'), ordering)
+        return vehicles.filter(
+            _keyset_filter(_ordering_keys(ordering), values, 'lt')
+        ).order_by(*ordering)[:page_size + 1]
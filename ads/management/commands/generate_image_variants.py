@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+
+from ads.images import generate_derivatives
+from ads.models import VehicleImage
+
+
+class Command(BaseCommand):
+    help = 'Generate the resized WebP/JPEG variants for vehicle images that do not have them yet'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help='Regenerate variants for every image, not only the ones missing them',
+        )
+
+    def handle(self, *args, **options):
+        images = VehicleImage.objects.exclude(image='').order_by('id')
+        if not options['all']:
+            images = images.filter(variants={})
+
+        total = images.count()
+        done = failed = 0
+        for vehicle_image in images.iterator(chunk_size=200):
+            try:
+                generate_derivatives(vehicle_image)
+                done += 1
+            except Exception as e:
+                failed += 1
+                self.stderr.write(f'Error processing image {vehicle_image.id}: {str(e)}')
+            if (done + failed) % 100 == 0:
+                self.stdout.write(f'Processed {done + failed}/{total} images')
+
+        self.stdout.write(self.style.SUCCESS(f'Generated variants for {done} images ({failed} failed)'))
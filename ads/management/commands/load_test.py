@@ -0,0 +1,68 @@
+import statistics
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlencode, urljoin
+
+import requests
+from django.core.management.base import BaseCommand, CommandError
+
+DEFAULT_PATHS = ['/', '/ads/search/', '/ads/search/?type=car', '/ads/search/?q=toyota']
+
+
+class Command(BaseCommand):
+    help = (
+        'Fire concurrent GET requests at a running server and report requests per second. '
+        'Run it once per DB_POOL_MODE to compare connection settings.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--base-url', default='http://127.0.0.1:8000', help='Server to test')
+        parser.add_argument(
+            '--path',
+            action='append',
+            dest='paths',
+            help=f'Path to request, repeatable (default: {", ".join(DEFAULT_PATHS)})',
+        )
+        parser.add_argument('--requests', type=int, default=500, help='Total number of requests')
+        parser.add_argument('--concurrency', type=int, default=10, help='Requests in flight at once')
+        parser.add_argument(
+            '--use-cache',
+            action='store_true',
+            help='Let the listing page cache answer; by default every URL is made unique to reach the database',
+        )
+
+    def handle(self, *args, **options):
+        paths = options['paths'] or DEFAULT_PATHS
+        total = options['requests']
+        if total < 1 or options['concurrency'] < 1:
+            raise CommandError('--requests and --concurrency must be positive.')
+
+        # One keep-alive HTTP session per thread, so only the server side varies
+        sessions = threading.local()
+
+        def fetch(index):
+            url = urljoin(options['base_url'], paths[index % len(paths)])
+            if not options['use_cache']:
+                url += ('&' if '?' in url else '?') + urlencode({'nocache': uuid.uuid4().hex})
+            if not hasattr(sessions, 'session'):
+                sessions.session = requests.Session()
+            started = time.perf_counter()
+            try:
+                ok = sessions.session.get(url, timeout=30).status_code < 400
+            except requests.RequestException:
+                ok = False
+            return ok, time.perf_counter() - started
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['concurrency']) as executor:
+            results = list(executor.map(fetch, range(total)))
+        elapsed = time.perf_counter() - started
+
+        latencies = sorted(latency for _, latency in results)
+        errors = sum(1 for ok, _ in results if not ok)
+        p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+        self.stdout.write(f'{total} requests, concurrency {options["concurrency"]}, {errors} errors')
+        self.stdout.write(f'Latency: median {statistics.median(latencies) * 1000:.1f} ms, p95 {p95 * 1000:.1f} ms')
+        self.stdout.write(self.style.SUCCESS(f'{total / elapsed:.1f} requests/second'))
@@ -1,56 +1,153 @@
-from django.core.management.base import BaseCommand
-from django.core.files.storage import default_storage
-from django.core.files.base import ContentFile
-from ads.models import Vehicle
 import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from django.conf import settings
+from django.core.files.base import File
+from django.core.files.storage import FileSystemStorage, default_storage
+from django.core.management.base import BaseCommand, CommandError
+
+from ads.images import FORMAT_KEYS
+from ads.models import VehicleImage
+
 
 class Command(BaseCommand):
-    help = 'Migrate existing files to bunny.net'
+    help = (
+        'Copy vehicle images and their variants from the local media directory to bunny.net. '
+        'Uploads run concurrently, and an interrupted run resumes from its checkpoint file.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--source',
+            default=settings.MEDIA_ROOT,
+            help='Local media directory to copy from (default: MEDIA_ROOT)',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=settings.BUNNYCDN_POOL_SIZE,
+            help='Concurrent uploads (default: BUNNYCDN_POOL_SIZE)',
+        )
+        parser.add_argument('--chunk-size', type=int, default=500, help='VehicleImage rows fetched per query')
+        parser.add_argument(
+            '--checkpoint',
+            default=os.path.join(settings.BASE_DIR, 'logs', 'migrate_to_bunny.checkpoint'),
+            help='File listing the images already copied; delete it to start over',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Upload nothing; report the files that are missing or differ in size on bunny.net',
+        )
+        parser.add_argument(
+            '--verify',
+            action='store_true',
+            help='After each upload, check that bunny.net has the same size as the local file',
+        )
 
     def handle(self, *args, **options):
-        self.stdout.write('Starting file migration to bunny.net...')
-        
-        # Migrate vehicle images
-        vehicles = Vehicle.objects.all()
-        total = vehicles.count()
-        migrated = 0
-        
-        for vehicle in vehicles:
+        if isinstance(default_storage, FileSystemStorage):
+            raise CommandError('The default storage is the local filesystem; configure the BUNNYCDN_* settings first.')
+        if options['workers'] < 1 or options['chunk_size'] < 1:
+            raise CommandError('--workers and --chunk-size must be positive.')
+
+        self.source = FileSystemStorage(location=options['source'])
+        self.dry_run = options['dry_run']
+        self.verify = options['verify']
+        self.lock = threading.Lock()
+        self.files = self.bytes = self.failed = 0
+
+        done = set() if self.dry_run else self.load_checkpoint(options['checkpoint'])
+        if done:
+            self.stdout.write(f'Resuming: {len(done)} images already copied')
+
+        images = VehicleImage.objects.exclude(image='').order_by('pk').values_list('pk', 'image', 'variants')
+        self.started = self.last_report = time.monotonic()
+        checkpoint = None if self.dry_run else open(options['checkpoint'], 'a')
+        try:
+            with ThreadPoolExecutor(max_workers=options['workers']) as executor:
+                pending = {}
+                for pk, image, variants in images.iterator(chunk_size=options['chunk_size']):
+                    if pk in done:
+                        continue
+                    pending[executor.submit(self.copy_image, self.image_files(image, variants))] = pk
+                    # Keep a bounded number of uploads queued, not the whole table
+                    if len(pending) >= options['workers'] * 4:
+                        finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+                        self.record({future: pending.pop(future) for future in finished}, checkpoint)
+                self.record(pending, checkpoint)
+        finally:
+            if checkpoint:
+                checkpoint.close()
+
+        self.report()
+        verb = 'would be copied' if self.dry_run else 'copied'
+        message = f'{self.files} files ({self.bytes / 1_000_000:.1f} MB) {verb}, {self.failed} images failed'
+        if self.failed:
+            raise CommandError(f'{message}; run the command again to retry them')
+        self.stdout.write(self.style.SUCCESS(message))
+
+    def load_checkpoint(self, path):
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+            return set()
+        with open(path) as f:
+            return {int(line) for line in f if line.strip()}
+
+    def image_files(self, image, variants):
+        names = [image]
+        for entry in (variants or {}).values():
+            names.extend(entry[format_key] for format_key in FORMAT_KEYS if entry.get(format_key))
+        return names
+
+    def remote_size(self, name):
+        try:
+            return default_storage.size(name)
+        except Exception:
+            return None
+
+    def copy_image(self, names):
+        """Copy one image's files; runs in a worker thread and never touches the database."""
+        for name in names:
+            if not self.source.exists(name):
+                # Already removed locally, or the variant was never written here
+                continue
+            size = self.source.size(name)
+            if self.dry_run:
+                if self.remote_size(name) == size:
+                    continue
+                self.stdout.write(f'Would copy {name} ({size} bytes)')
+            else:
+                with self.source.open(name, 'rb') as f:
+                    # _save keeps the key as-is; save() would add a random prefix
+                    default_storage._save(name, File(f, name=name))
+                if self.verify and self.remote_size(name) != size:
+                    raise ValueError(f'Size mismatch for {name} after upload')
+            with self.lock:
+                self.files += 1
+                self.bytes += size
+
+    def record(self, futures, checkpoint):
+        """Checkpoint the images whose uploads finished; ``futures`` maps future -> image pk."""
+        for future, pk in futures.items():
             try:
-                # Migrate main image
-                if vehicle.main_image:
-                    self.migrate_file(vehicle.main_image)
-                
-                # Migrate additional images
-                for image in vehicle.images.all():
-                    if image.image:
-                        self.migrate_file(image.image)
-                
-                migrated += 1
-                self.stdout.write(f'Migrated files for vehicle {migrated}/{total}')
-                
+                future.result()
             except Exception as e:
-                self.stderr.write(f'Error migrating files for vehicle {vehicle.id}: {str(e)}')
-        
-        self.stdout.write(self.style.SUCCESS(f'Successfully migrated files for {migrated} vehicles'))
-
-    def migrate_file(self, file_field):
-        if not file_field:
-            return
-            
-        try:
-            # Read the file content
-            file_content = file_field.read()
-            
-            # Save to new storage
-            new_file = default_storage.save(
-                file_field.name,
-                ContentFile(file_content)
-            )
-            
-            # Update the field with new path
-            file_field.name = new_file
-            file_field.save()
-            
-        except Exception as e:
-            raise Exception(f'Error migrating file {file_field.name}: {str(e)}') 
\ No newline at end of file
+                self.failed += 1
+                self.stderr.write(f'Error copying image {pk}: {e}')
+                continue
+            if checkpoint:
+                checkpoint.write(f'{pk}\n')
+                checkpoint.flush()
+        if time.monotonic() - self.last_report >= 10:
+            self.report()
+
+    def report(self):
+        self.last_report = time.monotonic()
+        elapsed = max(time.monotonic() - self.started, 0.001)
+        self.stdout.write(
+            f'{self.files} files, {self.bytes / 1_000_000:.1f} MB in {elapsed:.0f}s '
+            f'({self.files / elapsed:.1f} files/s, {self.bytes / 1_000_000 / elapsed:.2f} MB/s)'
+        )
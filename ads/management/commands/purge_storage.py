@@ -0,0 +1,32 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from ads import tombstones
+
+
+class Command(BaseCommand):
+    help = 'Delete the media files of removed vehicle images from storage in concurrent batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Exit once nothing is due instead of polling')
+        parser.add_argument('--batch', type=int, default=settings.STORAGE_GC_BATCH_SIZE, help='Files claimed per poll')
+        parser.add_argument('--workers', type=int, default=settings.STORAGE_GC_WORKERS, help='Concurrent storage deletes')
+        parser.add_argument('--sleep', type=float, default=5.0, help='Seconds to wait when nothing is due')
+
+    def handle(self, *args, **options):
+        try:
+            while True:
+                close_old_connections()
+                claimed = tombstones.claim_tombstones(options['batch'])
+                if claimed:
+                    purged = tombstones.purge(claimed, options['workers'])
+                    self.stdout.write(f'Purged {purged}/{len(claimed)} files')
+                    continue
+                if options['once']:
+                    break
+                time.sleep(options['sleep'])
+        except KeyboardInterrupt:
+            pass
@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from ads.models import Favorite, Vehicle
+
+
+class Command(BaseCommand):
+    help = 'Recompute Vehicle.favorite_count from the Favorite table and fix any drift'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Only report how many ads are off')
+
+    def handle(self, *args, **options):
+        actual = Coalesce(
+            Subquery(
+                Favorite.objects.filter(vehicle=OuterRef('pk'))
+                .order_by()
+                .values('vehicle')
+                .annotate(total=Count('*'))
+                .values('total'),
+                output_field=IntegerField(),
+            ),
+            0,
+        )
+        # One set-based UPDATE that only touches the rows that drifted
+        drifted = Vehicle.objects.annotate(actual_count=actual).exclude(favorite_count=F('actual_count'))
+
+        if options['dry_run']:
+            self.stdout.write(f'{drifted.count()} ads have a wrong favorite count')
+            return
+
+        updated = Vehicle.objects.filter(pk__in=drifted.values('pk')).update(favorite_count=actual)
+        self.stdout.write(self.style.SUCCESS(f'Fixed the favorite count of {updated} ads'))
@@ -0,0 +1,35 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from ads import jobs
+
+
+class Command(BaseCommand):
+    help = 'Run queued background jobs (image uploads and variants)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Exit once no job is due instead of polling')
+        parser.add_argument('--batch', type=int, default=10, help='Jobs claimed per poll')
+        parser.add_argument('--sleep', type=float, default=2.0, help='Seconds to wait when the queue is empty')
+
+    def handle(self, *args, **options):
+        worker = jobs.worker_id()
+        self.stdout.write(f'Worker {worker} started')
+        try:
+            while True:
+                close_old_connections()
+                claimed = jobs.claim_jobs(worker, options['batch'])
+                for job in claimed:
+                    if jobs.run_job(job):
+                        self.stdout.write(f'Done    {job.kind} {job.idempotency_key}')
+                    else:
+                        self.stderr.write(f'Failed  {job.kind} {job.idempotency_key} (attempt {job.attempts}/{job.max_attempts})')
+                if not claimed:
+                    if options['once']:
+                        break
+                    time.sleep(options['sleep'])
+        except KeyboardInterrupt:
+            pass
+        self.stdout.write(f'Worker {worker} stopped')
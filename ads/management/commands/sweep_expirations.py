@@ -0,0 +1,111 @@
+import logging
+from collections import Counter
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from ads.cache import cache_is_shared, invalidate_vehicle_listings
+from ads.models import Vehicle
+from users.counters import adjust, vehicle_counter
+
+logger = logging.getLogger(__name__)
+
+# pg_try_advisory_lock key, so overlapping cron runs skip instead of racing
+SWEEP_LOCK_ID = 7301001
+
+
+class Command(BaseCommand):
+    help = 'Expire ads past their lifetime and end lapsed urgent/boost promotions (safe to run every minute)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=5000,
+            help='Rows updated per statement, keeping each lock short',
+        )
+        parser.add_argument('--dry-run', action='store_true', help='Only report what would change')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('sweep_expirations requires PostgreSQL.')
+        if settings.LISTING_CACHE_ENABLED and not cache_is_shared():
+            # The invalidations below would only reach this process's cache
+            message = (
+                'The default cache is process-local, so the web workers keep serving cached pages with '
+                'these ads for up to LISTING_CACHE_TIMEOUT. Configure a shared CACHE_BACKEND (Redis or '
+                'the database cache) or set LISTING_CACHE_ENABLED=False.'
+            )
+            logger.warning('sweep_expirations: %s', message)
+            self.stderr.write(self.style.WARNING(f'WARNING: {message}'))
+
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_try_advisory_lock(%s)', [SWEEP_LOCK_ID])
+            if not cursor.fetchone()[0]:
+                self.stdout.write('Another sweep is running, skipping')
+                return
+        try:
+            self.sweep(options['batch_size'], options['dry_run'])
+        finally:
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT pg_advisory_unlock(%s)', [SWEEP_LOCK_ID])
+
+    def sweep(self, batch_size, dry_run):
+        now = timezone.now()
+        today = timezone.localdate()
+        rules = [
+            (
+                'expired ads',
+                Vehicle.objects.filter(status='approved', expires_at__lte=now),
+                {'status': 'expired'},
+            ),
+            (
+                'urgent promotions',
+                Vehicle.objects.filter(is_urgent=True, urgent_end_date__lt=today),
+                {'is_urgent': False},
+            ),
+            (
+                'boost promotions',
+                Vehicle.objects.filter(is_boosted=True, boost_end_date__lt=today),
+                {'is_boosted': False},
+            ),
+        ]
+
+        for label, queryset, changes in rules:
+            if dry_run:
+                self.stdout.write(f'{label}: {queryset.count()} would be updated')
+                continue
+            updated = self.update_in_batches(queryset, changes, now, batch_size)
+            logger.info('sweep_expirations: %s %s', updated, label)
+            self.stdout.write(f'{label}: {updated} updated')
+
+    def update_in_batches(self, queryset, changes, now, batch_size):
+        """
+        Apply ``changes`` to every row of ``queryset`` with set-based UPDATEs,
+        keep the admin dashboard counters in step and invalidate the cached
+        listing pages those rows appeared on.
+        """
+        total = 0
+        while True:
+            with transaction.atomic():
+                # Lock a batch; SKIP LOCKED leaves rows being edited for the next run
+                rows = list(
+                    queryset.select_for_update(skip_locked=True)
+                    .order_by('pk')
+                    .values_list('pk', 'vehicle_type', 'make', 'status')[:batch_size]
+                )
+                if not rows:
+                    return total
+                Vehicle.objects.filter(pk__in=[row[0] for row in rows]).update(updated_at=now, **changes)
+                if 'status' in changes:
+                    # update() sends no signals, so move the dashboard counts here
+                    moved = Counter(vehicle_counter(row[3]) for row in rows)
+                    moved.subtract({vehicle_counter(changes['status']): len(rows)})
+                    adjust({name: -delta for name, delta in moved.items()})
+                pairs = {(vehicle_type, make) for _, vehicle_type, make, _ in rows}
+                transaction.on_commit(lambda pairs=pairs: invalidate_vehicle_listings(*pairs))
+            total += len(rows)
+            if len(rows) < batch_size:
+                return total
@@ -0,0 +1,36 @@
+# Generated by Django 5.0.2 on 2026-10-17 19:02
+
+import django.db.models.functions.text
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ads', '0020_vehicle_urgent_end_date'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='vehicle',
+            index=models.Index(fields=['status', 'created_at'], name='vehicle_status_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='vehicle',
+            index=models.Index(fields=['status', 'vehicle_type', 'created_at'], name='vehicle_status_type_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='vehicle',
+            index=models.Index(models.F('status'), django.db.models.functions.text.Lower('make'), name='vehicle_status_make_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='vehicle',
+            index=models.Index(fields=['user', 'status', 'created_at'], name='vehicle_user_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='vehicle',
+            index=models.Index(condition=models.Q(('is_urgent', True), ('status', 'approved')), fields=['created_at'], name='vehicle_urgent_approved_idx'),
+        ),
+    ]
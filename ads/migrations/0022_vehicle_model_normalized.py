@@ -0,0 +1,34 @@
+# Generated by Django 5.0.2 on 2026-10-17 19:04
+
+import re
+
+from django.db import migrations, models
+
+
+def backfill_model_normalized(apps, schema_editor):
+    Vehicle = apps.get_model('ads', 'Vehicle')
+    batch = []
+    for vehicle in Vehicle.objects.only('id', 'model').iterator(chunk_size=2000):
+        vehicle.model_normalized = re.sub(r'[^a-z0-9]', '', (vehicle.model or '').lower())
+        batch.append(vehicle)
+        if len(batch) >= 2000:
+            Vehicle.objects.bulk_update(batch, ['model_normalized'])
+            batch = []
+    if batch:
+        Vehicle.objects.bulk_update(batch, ['model_normalized'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ads', '0021_vehicle_listing_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='vehicle',
+            name='model_normalized',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=100),
+        ),
+        migrations.RunPython(backfill_model_normalized, migrations.RunPython.noop),
+    ]
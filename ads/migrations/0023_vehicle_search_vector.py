@@ -0,0 +1,66 @@
+# Generated by Django 5.0.2 on 2026-10-17 19:05
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.conf import settings
+from django.db import migrations
+
+# Make and model rank highest, then type, location and finally the description.
+# The 'simple' configuration keeps make, model and place names unstemmed.
+CREATE_TRIGGER_SQL = """
+CREATE OR REPLACE FUNCTION ads_vehicle_search_vector_update() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'UPDATE'
+        AND NEW.search_vector IS NOT NULL
+        AND NEW.make IS NOT DISTINCT FROM OLD.make
+        AND NEW.model IS NOT DISTINCT FROM OLD.model
+        AND NEW.vehicle_type IS NOT DISTINCT FROM OLD.vehicle_type
+        AND NEW.location IS NOT DISTINCT FROM OLD.location
+        AND NEW.description IS NOT DISTINCT FROM OLD.description
+    THEN
+        -- Searchable text unchanged: keep the stored document
+        NEW.search_vector := OLD.search_vector;
+        RETURN NEW;
+    END IF;
+    NEW.search_vector :=
+        setweight(to_tsvector('simple', coalesce(NEW.make, '')), 'A') ||
+        setweight(to_tsvector('simple', coalesce(NEW.model, '')), 'A') ||
+        setweight(to_tsvector('simple', coalesce(NEW.vehicle_type, '')), 'B') ||
+        setweight(to_tsvector('simple', coalesce(NEW.location, '')), 'C') ||
+        setweight(to_tsvector('simple', coalesce(NEW.description, '')), 'D');
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER ads_vehicle_search_vector_trigger
+    BEFORE INSERT OR UPDATE ON ads_vehicle
+    FOR EACH ROW EXECUTE FUNCTION ads_vehicle_search_vector_update();
+
+UPDATE ads_vehicle SET search_vector = NULL;
+"""
+
+DROP_TRIGGER_SQL = """
+DROP TRIGGER IF EXISTS ads_vehicle_search_vector_trigger ON ads_vehicle;
+DROP FUNCTION IF EXISTS ads_vehicle_search_vector_update();
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ads', '0022_vehicle_model_normalized'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='vehicle',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunSQL(CREATE_TRIGGER_SQL, DROP_TRIGGER_SQL),
+        migrations.AddIndex(
+            model_name='vehicle',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='vehicle_search_vector_idx'),
+        ),
+    ]
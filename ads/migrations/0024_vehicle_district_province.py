@@ -0,0 +1,49 @@
+# Generated by Django 5.0.2 on 2026-10-17 19:08
+
+from django.conf import settings
+from django.db import migrations, models
+
+from ads.locations import resolve_location
+
+
+def backfill_district_province(apps, schema_editor):
+    Vehicle = apps.get_model('ads', 'Vehicle')
+    batch = []
+    for vehicle in Vehicle.objects.only('id', 'location').iterator(chunk_size=2000):
+        vehicle.district, vehicle.province = resolve_location(vehicle.location)
+        batch.append(vehicle)
+        if len(batch) >= 2000:
+            Vehicle.objects.bulk_update(batch, ['district', 'province'])
+            batch = []
+    if batch:
+        Vehicle.objects.bulk_update(batch, ['district', 'province'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ads', '0023_vehicle_search_vector'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='vehicle',
+            name='district',
+            field=models.CharField(blank=True, default='', editable=False, max_length=50),
+        ),
+        migrations.AddField(
+            model_name='vehicle',
+            name='province',
+            field=models.CharField(blank=True, default='', editable=False, max_length=50),
+        ),
+        migrations.RunPython(backfill_district_province, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='vehicle',
+            index=models.Index(fields=['status', 'district', 'created_at'], name='vehicle_status_district_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='vehicle',
+            index=models.Index(fields=['status', 'province', 'created_at'], name='vehicle_status_province_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.0.2 on 2026-10-17 19:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ads', '0024_vehicle_district_province'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='vehicleimage',
+            name='variants',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 5.0.2 on 2026-10-17 19:18
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ads', '0025_vehicleimage_variants'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='vehicleimage',
+            name='staged_name',
+            field=models.CharField(blank=True, default='', editable=False, max_length=255),
+        ),
+        migrations.AddField(
+            model_name='vehicleimage',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('ready', 'Ready'), ('failed', 'Failed')], default='ready', editable=False, max_length=20),
+        ),
+        migrations.AlterField(
+            model_name='vehicleimage',
+            name='image',
+            field=models.ImageField(blank=True, upload_to='vehicle_images/'),
+        ),
+        migrations.CreateModel(
+            name='Job',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(max_length=50)),
+                ('idempotency_key', models.CharField(max_length=255, unique=True)),
+                ('payload', models.JSONField(blank=True, default=dict)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('running', 'Running'), ('done', 'Done'), ('failed', 'Failed')], default='pending', max_length=20)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('max_attempts', models.PositiveIntegerField(default=5)),
+                ('run_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('locked_by', models.CharField(blank=True, default='', max_length=100)),
+                ('locked_at', models.DateTimeField(blank=True, null=True)),
+                ('last_error', models.TextField(blank=True, default='')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'indexes': [models.Index(condition=models.Q(('status', 'pending')), fields=['run_at'], name='job_pending_run_at_idx'), models.Index(condition=models.Q(('status', 'running')), fields=['locked_at'], name='job_running_locked_at_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.0.2 on 2026-10-17 19:20
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_expires_at(apps, schema_editor):
+    Vehicle = apps.get_model('ads', 'Vehicle')
+    Vehicle.objects.filter(expires_at__isnull=True).update(
+        expires_at=models.F('created_at') + timedelta(days=settings.AD_LIFETIME_DAYS)
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ads', '0026_vehicleimage_status_job'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='vehicle',
+            name='expires_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AlterField(
+            model_name='vehicle',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('approved', 'Approved'), ('rejected', 'Rejected'), ('expired', 'Expired')], default='pending', max_length=10),
+        ),
+        migrations.RunPython(backfill_expires_at, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='vehicle',
+            index=models.Index(condition=models.Q(('status', 'approved')), fields=['expires_at'], name='vehicle_approved_expires_idx'),
+        ),
+    ]
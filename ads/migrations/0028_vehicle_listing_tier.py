@@ -0,0 +1,24 @@
+# Generated by Django 5.0.2 on 2026-10-17 19:21
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ads', '0027_vehicle_expires_at'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='vehicle',
+            name='listing_tier',
+            field=models.GeneratedField(db_persist=True, expression=models.Case(models.When(is_boosted=True, then=models.Value(2)), models.When(is_urgent=True, then=models.Value(1)), default=models.Value(0)), output_field=models.SmallIntegerField()),
+        ),
+        migrations.AddIndex(
+            model_name='vehicle',
+            index=models.Index(fields=['status', 'listing_tier', 'created_at', 'id'], name='vehicle_status_tier_idx'),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.0.2 on 2026-10-17 19:27
+
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+
+
+def backfill_favorite_count(apps, schema_editor):
+    Vehicle = apps.get_model('ads', 'Vehicle')
+    Favorite = apps.get_model('ads', 'Favorite')
+    counts = (
+        Favorite.objects.filter(vehicle=models.OuterRef('pk'))
+        .order_by()
+        .values('vehicle')
+        .annotate(total=models.Count('*'))
+        .values('total')
+    )
+    Vehicle.objects.update(
+        favorite_count=Coalesce(models.Subquery(counts, output_field=models.IntegerField()), 0)
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ads', '0028_vehicle_listing_tier'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='vehicle',
+            name='favorite_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_favorite_count, migrations.RunPython.noop),
+    ]
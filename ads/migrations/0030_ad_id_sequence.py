@@ -0,0 +1,16 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ads', '0029_vehicle_favorite_count'),
+    ]
+
+    operations = [
+        # Block numbers for ads.identifiers.ad_ids
+        migrations.RunSQL(
+            'CREATE SEQUENCE IF NOT EXISTS ads_vehicle_ad_id_seq',
+            'DROP SEQUENCE IF EXISTS ads_vehicle_ad_id_seq',
+        ),
+    ]
@@ -0,0 +1,84 @@
+# Generated by Django 5.0.2 on 2026-10-17 19:34
+
+import django.utils.timezone
+from django.db import migrations, models
+
+# Queue the files of deleted or replaced vehicle images for the purge_storage
+# worker. Statement-level triggers with transition tables add one INSERT per
+# DELETE/UPDATE statement however many rows it touches. The format keys match
+# ads.images.FORMAT_KEYS.
+CREATE_TRIGGER_SQL = """
+CREATE OR REPLACE FUNCTION ads_vehicleimage_files(image text, variants jsonb) RETURNS SETOF text AS $$
+    SELECT image WHERE image <> ''
+    UNION
+    SELECT file.value
+    FROM jsonb_each(variants) AS variant,
+         jsonb_each_text(CASE WHEN jsonb_typeof(variant.value) = 'object' THEN variant.value ELSE '{}' END) AS file
+    WHERE file.key IN ('webp', 'jpeg') AND file.value <> ''
+$$ LANGUAGE sql IMMUTABLE;
+
+CREATE OR REPLACE FUNCTION ads_vehicleimage_bury_files() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        INSERT INTO ads_storagetombstone (name, attempts, purge_after, last_error, created_at)
+        SELECT DISTINCT file, 0, now(), '', now()
+        FROM removed, ads_vehicleimage_files(removed.image, removed.variants) AS file;
+    ELSE
+        -- Files the old row referenced and the new one no longer does
+        INSERT INTO ads_storagetombstone (name, attempts, purge_after, last_error, created_at)
+        SELECT DISTINCT file, 0, now(), '', now()
+        FROM removed
+        JOIN added ON added.id = removed.id,
+             ads_vehicleimage_files(removed.image, removed.variants) AS file
+        WHERE (removed.image, removed.variants) IS DISTINCT FROM (added.image, added.variants)
+          AND NOT EXISTS (
+              SELECT 1 FROM ads_vehicleimage_files(added.image, added.variants) AS kept
+              WHERE kept = file
+          );
+    END IF;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER ads_vehicleimage_delete_files
+    AFTER DELETE ON ads_vehicleimage
+    REFERENCING OLD TABLE AS removed
+    FOR EACH STATEMENT EXECUTE FUNCTION ads_vehicleimage_bury_files();
+
+CREATE TRIGGER ads_vehicleimage_replace_files
+    AFTER UPDATE ON ads_vehicleimage
+    REFERENCING OLD TABLE AS removed NEW TABLE AS added
+    FOR EACH STATEMENT EXECUTE FUNCTION ads_vehicleimage_bury_files();
+"""
+
+DROP_TRIGGER_SQL = """
+DROP TRIGGER IF EXISTS ads_vehicleimage_replace_files ON ads_vehicleimage;
+DROP TRIGGER IF EXISTS ads_vehicleimage_delete_files ON ads_vehicleimage;
+DROP FUNCTION IF EXISTS ads_vehicleimage_bury_files();
+DROP FUNCTION IF EXISTS ads_vehicleimage_files(text, jsonb);
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ads', '0030_ad_id_sequence'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StorageTombstone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=500)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('purge_after', models.DateTimeField(default=django.utils.timezone.now)),
+                ('last_error', models.TextField(blank=True, default='')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['purge_after'], name='tombstone_purge_after_idx')],
+            },
+        ),
+        migrations.RunSQL(CREATE_TRIGGER_SQL, DROP_TRIGGER_SQL),
+    ]
@@ -0,0 +1,114 @@
+# Generated by Django 5.0.2 on 2026-10-17 19:36
+
+import django.contrib.postgres.indexes
+from django.conf import settings
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations, models
+
+# admin_search_text is rebuilt when the ad's own searchable columns change or
+# when it is set to NULL, which the owner triggers below do after a rename or
+# a new unique_id. A save() that writes back a stale value keeps the stored one.
+CREATE_TRIGGER_SQL = """
+CREATE OR REPLACE FUNCTION ads_vehicle_admin_search_update() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'UPDATE'
+        AND NEW.admin_search_text IS NOT NULL
+        AND NEW.user_id IS NOT DISTINCT FROM OLD.user_id
+        AND NEW.ad_id IS NOT DISTINCT FROM OLD.ad_id
+        AND NEW.make IS NOT DISTINCT FROM OLD.make
+        AND NEW.model IS NOT DISTINCT FROM OLD.model
+        AND NEW.vehicle_type IS NOT DISTINCT FROM OLD.vehicle_type
+        AND NEW.location IS NOT DISTINCT FROM OLD.location
+        AND NEW.description IS NOT DISTINCT FROM OLD.description
+        AND NEW.phone_number IS NOT DISTINCT FROM OLD.phone_number
+        AND NEW.whatsapp_number IS NOT DISTINCT FROM OLD.whatsapp_number
+    THEN
+        NEW.admin_search_text := OLD.admin_search_text;
+        RETURN NEW;
+    END IF;
+    SELECT lower(concat_ws(' ',
+        NEW.ad_id, NEW.make, NEW.model, NEW.vehicle_type, NEW.location, NEW.description,
+        NEW.phone_number, NEW.whatsapp_number,
+        owner.username, owner.first_name, owner.last_name, profile.unique_id
+    ))
+    INTO NEW.admin_search_text
+    FROM auth_user AS owner
+    LEFT JOIN users_userprofile AS profile ON profile.user_id = owner.id
+    WHERE owner.id = NEW.user_id;
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER ads_vehicle_admin_search_trigger
+    BEFORE INSERT OR UPDATE ON ads_vehicle
+    FOR EACH ROW EXECUTE FUNCTION ads_vehicle_admin_search_update();
+
+CREATE OR REPLACE FUNCTION ads_vehicle_admin_search_owner_changed() RETURNS trigger AS $$
+BEGIN
+    IF TG_TABLE_NAME = 'auth_user' THEN
+        UPDATE ads_vehicle SET admin_search_text = NULL WHERE user_id = NEW.id;
+    ELSE
+        UPDATE ads_vehicle SET admin_search_text = NULL WHERE user_id = NEW.user_id;
+    END IF;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER ads_vehicle_admin_search_user_trigger
+    AFTER UPDATE ON auth_user
+    FOR EACH ROW
+    WHEN ((OLD.username, OLD.first_name, OLD.last_name) IS DISTINCT FROM (NEW.username, NEW.first_name, NEW.last_name))
+    EXECUTE FUNCTION ads_vehicle_admin_search_owner_changed();
+
+CREATE TRIGGER ads_vehicle_admin_search_profile_insert_trigger
+    AFTER INSERT ON users_userprofile
+    FOR EACH ROW EXECUTE FUNCTION ads_vehicle_admin_search_owner_changed();
+
+CREATE TRIGGER ads_vehicle_admin_search_profile_update_trigger
+    AFTER UPDATE ON users_userprofile
+    FOR EACH ROW
+    WHEN (OLD.unique_id IS DISTINCT FROM NEW.unique_id)
+    EXECUTE FUNCTION ads_vehicle_admin_search_owner_changed();
+
+UPDATE ads_vehicle SET admin_search_text = NULL;
+"""
+
+DROP_TRIGGER_SQL = """
+DROP TRIGGER IF EXISTS ads_vehicle_admin_search_profile_update_trigger ON users_userprofile;
+DROP TRIGGER IF EXISTS ads_vehicle_admin_search_profile_insert_trigger ON users_userprofile;
+DROP TRIGGER IF EXISTS ads_vehicle_admin_search_user_trigger ON auth_user;
+DROP FUNCTION IF EXISTS ads_vehicle_admin_search_owner_changed();
+DROP TRIGGER IF EXISTS ads_vehicle_admin_search_trigger ON ads_vehicle;
+DROP FUNCTION IF EXISTS ads_vehicle_admin_search_update();
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ads', '0031_storage_tombstone'),
+        ('users', '0009_userprofile_unique_id_sequence'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.AddField(
+            model_name='vehicle',
+            name='admin_search_text',
+            field=models.TextField(editable=False, null=True),
+        ),
+        migrations.RunSQL(CREATE_TRIGGER_SQL, DROP_TRIGGER_SQL),
+        migrations.AddIndex(
+            model_name='vehicle',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['admin_search_text'], name='vehicle_admin_search_trgm_idx', opclasses=['gin_trgm_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='vehicle',
+            index=models.Index(fields=['phone_number'], name='vehicle_phone_number_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='vehicle',
+            index=models.Index(fields=['whatsapp_number'], name='vehicle_whatsapp_number_idx'),
+        ),
+    ]
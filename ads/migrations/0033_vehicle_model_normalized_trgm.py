@@ -0,0 +1,25 @@
+# Generated by Django 5.0.2 on 2026-10-17 19:47
+
+import django.contrib.postgres.indexes
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ads', '0032_vehicle_admin_search_text'),
+    ]
+
+    operations = [
+        # The trigram index replaces the pattern_ops index of db_index=True,
+        # which only served prefix matches. pg_trgm is installed by 0032.
+        migrations.AlterField(
+            model_name='vehicle',
+            name='model_normalized',
+            field=models.CharField(blank=True, default='', editable=False, max_length=100),
+        ),
+        migrations.AddIndex(
+            model_name='vehicle',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['model_normalized'], name='vehicle_model_trgm_idx', opclasses=['gin_trgm_ops']),
+        ),
+    ]
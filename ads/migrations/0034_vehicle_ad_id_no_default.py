@@ -0,0 +1,18 @@
+# Generated by Django 5.0.2 on 2026-10-17 19:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ads', '0033_vehicle_model_normalized_trgm'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='vehicle',
+            name='ad_id',
+            field=models.CharField(blank=True, editable=False, max_length=7, unique=True),
+        ),
+    ]
@@ -1,17 +1,31 @@
-from django.db import models
+from datetime import timedelta
+from django.conf import settings
+from django.db import IntegrityError, models, router, transaction
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
+from django.db.models import Case, F, Q, Value, When
+from django.db.models.functions import Lower
 from django.contrib.auth.models import User
-import random
-import string
+import re
+from django.utils import timezone
 from django.utils.text import slugify
+from django_cleanup import cleanup
+from .identifiers import MAX_ATTEMPTS, ad_ids, is_unique_violation
+from .images import build_srcset, variant_url
+from .locations import resolve_location
 
-def generate_ad_id():
-    while True:
-        # Generate a random 6-digit number
-        digits = ''.join(random.choices(string.digits, k=6))
-        ad_id = f'A{digits}'
-        # Check if this ID already exists
-        if not Vehicle.objects.filter(ad_id=ad_id).exists():
-            return ad_id
+def generate_ad_id(using=None):
+    # A###### from the ad id sequence of the database ``using``; see ads.identifiers
+    return f'A{ad_ids.next(using):06d}'
+
+# Values of Vehicle.listing_tier, highest first in search results
+LISTING_TIER_BOOSTED = 2
+LISTING_TIER_URGENT = 1
+LISTING_TIER_STANDARD = 0
+
+def normalize_model_name(value):
+    """Lowercase a model name and strip everything except letters and digits."""
+    return re.sub(r'[^a-z0-9]', '', (value or '').lower())
 
 class Vehicle(models.Model):
     CONDITION_CHOICES = [
@@ -35,21 +49,36 @@ class Vehicle(models.Model):
     STATUS_CHOICES = [
         ('pending', 'Pending'),
         ('approved', 'Approved'),
-        ('rejected', 'Rejected')
+        ('rejected', 'Rejected'),
+        ('expired', 'Expired')
     ]
 
     # Basic Info
     user = models.ForeignKey(User, on_delete=models.CASCADE)
-    ad_id = models.CharField(max_length=7, unique=True, default=generate_ad_id)
+    # Allocated in save() when the ad is first inserted
+    ad_id = models.CharField(max_length=7, unique=True, blank=True, editable=False)
     slug = models.SlugField(max_length=255, unique=True, null=True, blank=True)
     vehicle_type = models.CharField(max_length=100)
     make = models.CharField(max_length=100)
     model = models.CharField(max_length=100)
+    # Search key for model, e.g. "Corolla-Axio" -> "corollaaxio". Maintained in save().
+    model_normalized = models.CharField(max_length=100, blank=True, default='', editable=False)
     condition = models.CharField(max_length=20, choices=CONDITION_CHOICES)
     is_urgent = models.BooleanField(default=False)
     urgent_end_date = models.DateField(null=True, blank=True)
     is_boosted = models.BooleanField(default=False)
     boost_end_date = models.DateField(null=True, blank=True)
+    # Search ranking tier: boosted ads first, then urgent ones, then the rest.
+    # Computed by the database; sweep_expirations clears lapsed promotions.
+    listing_tier = models.GeneratedField(
+        expression=Case(
+            When(is_boosted=True, then=Value(LISTING_TIER_BOOSTED)),
+            When(is_urgent=True, then=Value(LISTING_TIER_URGENT)),
+            default=Value(LISTING_TIER_STANDARD),
+        ),
+        output_field=models.SmallIntegerField(),
+        db_persist=True,
+    )
     
     # Contact Info
     phone_number = models.CharField(max_length=15)
@@ -65,6 +94,9 @@ class Vehicle(models.Model):
     exterior_color = models.CharField(max_length=50, null=True, blank=True)
     interior_color = models.CharField(max_length=50, null=True, blank=True)
     location = models.CharField(max_length=200)
+    # Derived from location in save() for indexed city/province filtering
+    district = models.CharField(max_length=50, blank=True, default='', editable=False)
+    province = models.CharField(max_length=50, blank=True, default='', editable=False)
     
     # Description
     description = models.TextField(null=True, blank=True)
@@ -88,52 +120,177 @@ class Vehicle(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    # Approved ads past this point are marked expired by sweep_expirations
+    expires_at = models.DateTimeField(null=True, blank=True, editable=False)
+    # Number of Favorite rows for this ad. Only ever changed with F() updates
+    # by the Favorite signals and reconcile_favorite_counts, never by save().
+    favorite_count = models.PositiveIntegerField(default=0, editable=False)
+
+    # Full-text search document over make, model, vehicle_type, location and
+    # description. Maintained by a database trigger (see migration 0023).
+    search_vector = SearchVectorField(null=True, editable=False)
+    # Lowercased ad id, vehicle fields, phone numbers and the owner's names and
+    # unique_id for the admin dashboard search. Maintained by database
+    # triggers on ads_vehicle, auth_user and users_userprofile (migration 0032).
+    admin_search_text = models.TextField(null=True, editable=False)
 
     def __str__(self):
         return f"{self.year} {self.make} {self.model}"
 
-    @property
-    def expires_at(self):
-        from datetime import timedelta
-        return self.created_at + timedelta(days=30)
-
     def save(self, *args, **kwargs):
-        # Automatically generate a unique slug if it is missing
-        if not self.slug:
-            base_slug = slugify(f"{self.make}-{self.model}-{self.year}")
-            slug_candidate = base_slug
-            counter = 1
-            while Vehicle.objects.filter(slug=slug_candidate).exists():
-                slug_candidate = f"{base_slug}-{counter}"
-                counter += 1
-            self.slug = slug_candidate
-        super().save(*args, **kwargs)
+        using = kwargs.get('using') or router.db_for_write(type(self), instance=self)
+        generated_ad_id = self._state.adding and not self.ad_id
+        if generated_ad_id:
+            # Not a field default, so unsaved instances (e.g. the one an empty
+            # VehicleForm builds) do not use up ids
+            self.ad_id = generate_ad_id(using)
+        # The ad id makes a generated slug unique without looking at other rows
+        generated_slug = not self.slug
+        if generated_slug:
+            self.slug = self.build_slug()
+        self.model_normalized = normalize_model_name(self.model)
+        self.district, self.province = resolve_location(self.location)
+        now = timezone.now()
+        lifetime = timedelta(days=settings.AD_LIFETIME_DAYS)
+        if self.expires_at is None:
+            self.expires_at = (self.created_at or now) + lifetime
+        elif self.status == 'approved' and self.expires_at <= now:
+            # An ad (re)approved after its lifetime ran out gets a fresh one
+            self.expires_at = now + lifetime
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None and not self._state.adding:
+            # Write every field except favorite_count, so saving an instance
+            # loaded earlier cannot undo favorites added in the meantime
+            update_fields = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and not field.generated and field.name != 'favorite_count'
+            ]
+        if update_fields is not None:
+            update_fields = set(update_fields)
+            if 'status' in update_fields:
+                update_fields.add('expires_at')
+            if 'model' in update_fields:
+                update_fields.add('model_normalized')
+            if 'location' in update_fields:
+                update_fields.update(('district', 'province'))
+            kwargs['update_fields'] = update_fields
+
+        if not self._state.adding:
+            super().save(*args, **kwargs)
+            return
+        # Only values built here are replaced on a clash: an allocated ad id
+        # can clash with an older random one, and so can the slug built from
+        # it. A clash on an ad id or slug the caller set is raised.
+        retry_columns = []
+        if generated_ad_id:
+            retry_columns = ['ad_id', 'slug'] if generated_slug else ['ad_id']
+        for attempt in range(1, MAX_ATTEMPTS + 1):
+            try:
+                with transaction.atomic(using=using):
+                    super().save(*args, **kwargs)
+                return
+            except IntegrityError as e:
+                if attempt == MAX_ATTEMPTS or not is_unique_violation(e, *retry_columns):
+                    raise
+                self.ad_id = generate_ad_id(using)
+                if generated_slug:
+                    self.slug = self.build_slug()
+
+    def build_slug(self):
+        suffix = f'-{self.ad_id.lower()}'
+        base_slug = slugify(f"{self.make}-{self.model}-{self.year}")
+        max_length = self._meta.get_field('slug').max_length
+        return base_slug[:max_length - len(suffix)] + suffix
 
     def delete(self, *args, **kwargs):
         # Log the deletion for admin tracking
         print(f"Deleting vehicle ad: {self.ad_id} ({self.year} {self.make} {self.model})")
-        
-        # Delete all related images first to ensure proper cleanup
-        for image in self.images.all():
-            if image.image:
-                try:
-                    image.image.delete(save=False)
-                except Exception as e:
-                    print(f"Error deleting image file: {e}")
-        
-        # Call the parent delete method
+
+        # The image files are queued for deletion by the ads_vehicleimage
+        # trigger (see StorageTombstone) as the cascade removes their rows
         super().delete(*args, **kwargs)
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Public listings: approved ads, newest first
+            models.Index(fields=['status', 'created_at'], name='vehicle_status_created_idx'),
+            # Vehicle type pages and the type filter
+            models.Index(fields=['status', 'vehicle_type', 'created_at'], name='vehicle_status_type_idx'),
+            # City and "any city in province" filters
+            models.Index(fields=['status', 'district', 'created_at'], name='vehicle_status_district_idx'),
+            models.Index(fields=['status', 'province', 'created_at'], name='vehicle_status_province_idx'),
+            # Case-insensitive make filter
+            models.Index(F('status'), Lower('make'), name='vehicle_status_make_idx'),
+            # Free-text search box
+            GinIndex(fields=['search_vector'], name='vehicle_search_vector_idx'),
+            # Admin dashboard substring search
+            GinIndex(fields=['admin_search_text'], opclasses=['gin_trgm_ops'], name='vehicle_admin_search_trgm_idx'),
+            # Substring LIKE on the normalized model name (ads.search.filter_vehicles)
+            GinIndex(fields=['model_normalized'], opclasses=['gin_trgm_ops'], name='vehicle_model_trgm_idx'),
+            # Admin dashboard exact phone number lookups
+            models.Index(fields=['phone_number'], name='vehicle_phone_number_idx'),
+            models.Index(fields=['whatsapp_number'], name='vehicle_whatsapp_number_idx'),
+            # Search results ordered by tier, then recency
+            models.Index(fields=['status', 'listing_tier', 'created_at', 'id'], name='vehicle_status_tier_idx'),
+            # sweep_expirations
+            models.Index(
+                fields=['expires_at'],
+                condition=Q(status='approved'),
+                name='vehicle_approved_expires_idx',
+            ),
+            # My Ads page
+            models.Index(fields=['user', 'status', 'created_at'], name='vehicle_user_status_idx'),
+            # Home page urgent listings
+            models.Index(
+                fields=['created_at'],
+                condition=Q(status='approved', is_urgent=True),
+                name='vehicle_urgent_approved_idx',
+            ),
+        ]
 
+# Files are removed through StorageTombstone rather than one synchronous
+# storage call per deleted row
+@cleanup.ignore
 class VehicleImage(models.Model):
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('ready', 'Ready'),
+        ('failed', 'Failed'),
+    ]
+
     vehicle = models.ForeignKey(Vehicle, related_name='images', on_delete=models.CASCADE)
-    image = models.ImageField(upload_to='vehicle_images/')
+    # Empty until the upload job has copied the staged file to storage
+    image = models.ImageField(upload_to='vehicle_images/', blank=True)
+    # Local copy of an upload waiting for the background job, see ads.jobs
+    staged_name = models.CharField(max_length=255, blank=True, default='', editable=False)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='ready', editable=False)
+    # Resized copies keyed by variant, see ads.images.generate_derivatives:
+    # {"card": {"width": 480, "height": 320, "webp": "...", "jpeg": "..."}, ...}
+    variants = models.JSONField(default=dict, blank=True, editable=False)
     
     def __str__(self):
         return f"Image for {self.vehicle}"
 
+    def srcset(self, format_key='webp'):
+        return build_srcset(self.variants, format_key, self.image.storage)
+
+    @property
+    def webp_srcset(self):
+        return self.srcset('webp')
+
+    @property
+    def jpeg_srcset(self):
+        return self.srcset('jpeg')
+
+    @property
+    def gallery_url(self):
+        return variant_url(self.variants, 'gallery', 'jpeg', self.image.storage) or (self.image.url if self.image else None)
+
+    @property
+    def full_url(self):
+        return variant_url(self.variants, 'full', 'jpeg', self.image.storage) or (self.image.url if self.image else None)
+
 class VehicleAd(models.Model):
     STATUS_CHOICES = [
         ('pending', 'Pending'),
@@ -169,6 +326,81 @@ class Favorite(models.Model):
     class Meta:
         unique_together = ('user', 'vehicle')
 
+    def save(self, *args, **kwargs):
+        # The favorite_count increment in signals.py runs in this transaction
+        with transaction.atomic(using=kwargs.get('using')):
+            super().save(*args, **kwargs)
+
     def __str__(self):
         # Use the Vehicle.__str__ representation instead of non-existent title attribute
         return f"{self.user.username}'s favorite: {self.vehicle}"
+
+class Job(models.Model):
+    """
+    A unit of background work, run by the ``run_jobs`` management command.
+
+    ``idempotency_key`` identifies the work (e.g. one key per VehicleImage), so
+    queueing the same work twice updates the existing job instead of adding one.
+    """
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ]
+
+    kind = models.CharField(max_length=50)
+    idempotency_key = models.CharField(max_length=255, unique=True)
+    payload = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=5)
+    run_at = models.DateTimeField(default=timezone.now)
+    locked_by = models.CharField(max_length=100, blank=True, default='')
+    locked_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            # Workers claim the oldest due pending jobs
+            models.Index(
+                fields=['run_at'],
+                condition=Q(status='pending'),
+                name='job_pending_run_at_idx',
+            ),
+            # Reclaiming jobs from crashed workers
+            models.Index(
+                fields=['locked_at'],
+                condition=Q(status='running'),
+                name='job_running_locked_at_idx',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} {self.idempotency_key} ({self.status})"
+
+class StorageTombstone(models.Model):
+    """
+    A media file whose database row is gone and which is waiting to be
+    deleted from storage by the ``purge_storage`` worker.
+
+    Rows are written by database triggers on ads_vehicleimage (migration
+    0031), so every delete path, cascades included, records its files in the
+    same transaction and never waits on the storage API.
+    """
+    name = models.CharField(max_length=500)
+    attempts = models.PositiveIntegerField(default=0)
+    # Not picked up before this; pushed forward while claimed and on failure
+    purge_after = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['purge_after'], name='tombstone_purge_after_idx'),
+        ]
+
+    def __str__(self):
+        return self.name
@@ -0,0 +1,346 @@
+import base64
+import json
+from datetime import datetime
+
+from django.conf import settings
+from django.db import connection
+from django.contrib.postgres.search import SearchHeadline, SearchQuery, SearchRank
+from django.db.models import F, Field, FloatField, Func, Q, Value
+from django.db.models.functions import Cast, Lower
+from django.db.models.lookups import Exact, GreaterThan, LessThan
+from django.utils.dateparse import parse_datetime
+from django.utils.html import escape, strip_tags
+from django.utils.safestring import mark_safe
+
+from .models import Vehicle, normalize_model_name
+
+# Query string parameters understood by the search views
+SEARCH_FIELDS = ('q', 'type', 'make', 'model', 'condition', 'min_price', 'max_price', 'city', 'fuel')
+
+# The parameters behind facet_conditions
+FACET_FIELDS = ('type', 'make', 'condition', 'min_price', 'max_price', 'fuel')
+
+# Listing order used by keyset pagination. Every column must be in the cursor.
+# Boosted and urgent ads come first (Vehicle.listing_tier), newest first within
+# each tier; the (status, listing_tier, created_at, id) index matches this order.
+SEARCH_ORDERING = ('-listing_tier', '-created_at', '-id')
+
+# Free-text results are ordered by relevance within each tier
+RANKED_ORDERING = ('-listing_tier', '-rank', '-created_at', '-id')
+
+# Must match the configuration used by the search_vector trigger (migration 0023)
+SEARCH_CONFIG = 'simple'
+
+# Private-use characters that mark matches in snippets until they are escaped
+_HIGHLIGHT_START = '\ue000'
+_HIGHLIGHT_STOP = '\ue001'
+
+
+def get_search_params(request, vehicle_type=None):
+    """Collect the search parameters from the request query string."""
+    params = {field: request.GET.get(field) for field in SEARCH_FIELDS}
+    if vehicle_type:
+        params['type'] = vehicle_type
+    return params
+
+
+def facet_conditions(params):
+    """
+    Return the conditions of the filters the search form shows facet counts
+    for, keyed by facet: vehicle_type, make, condition, price and fuel.
+    Facets are counted with every filter except their own, see
+    ads.facets.count_facets.
+    """
+    vehicle_type = params.get('type')
+    make = params.get('make')
+    condition = params.get('condition')
+    min_price = params.get('min_price')
+    max_price = params.get('max_price')
+    fuel = params.get('fuel')
+    conditions = {}
+
+    if vehicle_type:
+        # Vehicle types are stored lowercase (see VehicleForm.VEHICLE_TYPES)
+        conditions['vehicle_type'] = Q(vehicle_type=vehicle_type.lower())
+
+    if make:
+        # Compare on lower(make) so the (status, lower(make)) index applies
+        conditions['make'] = Exact(Lower('make'), make.lower())
+
+    if condition and condition != 'any':
+        conditions['condition'] = Q(condition=condition)
+
+    price = Q()
+    if min_price:
+        price &= Q(price__gte=min_price)
+    if max_price:
+        price &= Q(price__lte=max_price)
+    if price:
+        conditions['price'] = price
+
+    if fuel and fuel != 'any':
+        conditions['fuel'] = Q(fuel_type=fuel)
+
+    return conditions
+
+
+def filter_vehicles(params):
+    """Return the approved vehicles matching the given search parameters."""
+    vehicles = Vehicle.objects.filter(status='approved')
+
+    query = get_text_query(params)
+    if query is not None:
+        vehicles = vehicles.filter(search_vector=query)
+
+    model = params.get('model')
+    city = params.get('city')
+
+    if model:
+        # Spaces, hyphens and case are ignored, so "c-hr" finds "CHR" and "C HR",
+        # and any part of the name matches ("axio" finds "Corolla Axio"). The
+        # trigram index on the normalized column serves the unanchored LIKE.
+        normalized = normalize_model_name(model)
+        if normalized:
+            vehicles = vehicles.filter(model_normalized__contains=normalized)
+
+    if city and city != 'any':
+        if city.startswith('any_'):
+            # "Any city in province", e.g. any_western
+            vehicles = vehicles.filter(province=city[4:].lower())
+        else:
+            vehicles = vehicles.filter(district=city.lower())
+
+    for condition in facet_conditions(params).values():
+        vehicles = vehicles.filter(condition)
+
+    return vehicles
+
+
+def get_text_query(params):
+    """Return the SearchQuery for the free-text ``q`` parameter, or None."""
+    text = (params.get('q') or '').strip()
+    if not text:
+        return None
+    return SearchQuery(text, config=SEARCH_CONFIG, search_type='websearch')
+
+
+def order_vehicles(vehicles, params):
+    """
+    Return ``(queryset, ordering)`` for the search results.
+
+    Free-text searches are ranked with ts_rank. The rank is cast to double
+    precision so the value stored in a page cursor compares exactly.
+    """
+    query = get_text_query(params)
+    if query is None:
+        return vehicles, SEARCH_ORDERING
+    vehicles = vehicles.annotate(
+        rank=Cast(SearchRank(F('search_vector'), query), FloatField())
+    )
+    return vehicles, RANKED_ORDERING
+
+
+def attach_snippets(vehicles, params):
+    """
+    Set ``search_snippet`` on each vehicle to a description excerpt with the
+    matched words highlighted. Runs ts_headline only for the rows on the page.
+    """
+    query = get_text_query(params)
+    for vehicle in vehicles:
+        vehicle.search_snippet = None
+    if query is None or not vehicles:
+        return vehicles
+
+    headlines = dict(Vehicle.objects.filter(
+        id__in=[vehicle.id for vehicle in vehicles]
+    ).exclude(description__isnull=True).exclude(description='').annotate(
+        headline=SearchHeadline(
+            'description',
+            query,
+            config=SEARCH_CONFIG,
+            start_sel=_HIGHLIGHT_START,
+            stop_sel=_HIGHLIGHT_STOP,
+            max_words=25,
+            min_words=10,
+        )
+    ).values_list('id', 'headline'))
+
+    for vehicle in vehicles:
+        headline = headlines.get(vehicle.id)
+        if headline and _HIGHLIGHT_START in headline:
+            # Descriptions may contain HTML, so strip and escape before marking up
+            snippet = escape(strip_tags(headline))
+            snippet = snippet.replace(_HIGHLIGHT_START, '<mark>').replace(_HIGHLIGHT_STOP, '</mark>')
+            vehicle.search_snippet = mark_safe(snippet)
+    return vehicles
+
+
+def _ordering_keys(ordering):
+    """Field names of a descending ordering such as ``('-listing_tier', '-created_at', '-id')``."""
+    return [field.lstrip('-') for field in ordering]
+
+
+def encode_cursor(vehicle, ordering, direction):
+    """Build an opaque page token pointing just past ``vehicle``."""
+    values = []
+    for key in _ordering_keys(ordering):
+        value = getattr(vehicle, key)
+        if isinstance(value, datetime):
+            value = value.isoformat()
+        values.append(value)
+    payload = json.dumps({'v': values, 'd': direction}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token, ordering):
+    """Decode a page token, returning ``(values, direction)`` or None if invalid."""
+    if not token:
+        return None
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()).decode())
+        values, direction = payload['v'], payload['d']
+    except (ValueError, KeyError, TypeError):
+        return None
+    # A token from a differently ordered search (e.g. before q was added) is ignored
+    if direction not in ('next', 'prev') or not isinstance(values, list) or len(values) != len(ordering):
+        return None
+    try:
+        values = [parse_datetime(value) if isinstance(value, str) else value for value in values]
+    except ValueError:
+        return None
+    if any(value is None for value in values):
+        return None
+    return values, direction
+
+
+class RowValue(Func):
+    """A row constructor, ``(a, b, c)``, for row-wise comparisons."""
+    function = ''
+    template = '(%(expressions)s)'
+    output_field = Field()
+
+
+def _keyset_filter(keys, values, lookup):
+    """
+    Build the row comparison ``(k1, k2, ...) < (v1, v2, ...)`` (or ``>``).
+
+    PostgreSQL uses a row comparison as an index condition when the keys
+    follow an index's column order, so later pages start their scan at the
+    cursor instead of filtering every row before it.
+    """
+    comparison = LessThan if lookup == 'lt' else GreaterThan
+    return comparison(
+        RowValue(*[F(key) for key in keys]),
+        RowValue(*[Value(value) for value in values]),
+    )
+
+
+def estimate_count(queryset):
+    """
+    Return the planner's row estimate for a queryset instead of running COUNT(*).
+
+    Only PostgreSQL exposes a usable estimate; other backends return None.
+    """
+    if connection.vendor != 'postgresql':
+        return None
+    sql, params = queryset.order_by().values('id').query.sql_with_params()
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+            plan = cursor.fetchone()[0]
+    except Exception:
+        return None
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+class SearchPage:
+    """One keyset-paginated page of search results."""
+
+    def __init__(self, object_list, next_cursor=None, prev_cursor=None, total_estimate=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+        self.total_estimate = total_estimate
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.prev_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+def paginate_vehicles(queryset, cursor=None, ordering=SEARCH_ORDERING, page_size=None, with_estimate=None):
+    """
+    Slice a vehicle queryset into a page using keyset pagination.
+
+    ``ordering`` must be all-descending and end in a unique column (``-id``).
+    Each page is a single indexed range scan of ``page_size + 1`` rows, so
+    the cost does not grow with how deep the user pages.
+    """
+    if page_size is None:
+        page_size = settings.SEARCH_PAGE_SIZE
+    if with_estimate is None:
+        with_estimate = settings.SEARCH_COUNT_ESTIMATE
+
+    total_estimate = estimate_count(queryset) if with_estimate else None
+    keys = _ordering_keys(ordering)
+
+    position = decode_cursor(cursor, ordering)
+    if position is None:
+        rows = list(queryset.order_by(*ordering)[:page_size + 1])
+        has_more = len(rows) > page_size
+        rows = rows[:page_size]
+        next_cursor = encode_cursor(rows[-1], ordering, 'next') if has_more else None
+        return SearchPage(rows, next_cursor=next_cursor, total_estimate=total_estimate)
+
+    values, direction = position
+    if direction == 'next':
+        # Rows strictly after the cursor in display order
+        rows = list(queryset.filter(
+            _keyset_filter(keys, values, 'lt')
+        ).order_by(*ordering)[:page_size + 1])
+        has_more = len(rows) > page_size
+        rows = rows[:page_size]
+        next_cursor = encode_cursor(rows[-1], ordering, 'next') if has_more and rows else None
+        prev_cursor = encode_cursor(rows[0], ordering, 'prev') if rows else None
+    else:
+        # Walk backwards from the cursor, then restore display order
+        rows = list(queryset.filter(
+            _keyset_filter(keys, values, 'gt')
+        ).order_by(*keys)[:page_size + 1])
+        has_more = len(rows) > page_size
+        rows = rows[:page_size]
+        rows.reverse()
+        prev_cursor = encode_cursor(rows[0], ordering, 'prev') if has_more and rows else None
+        next_cursor = encode_cursor(rows[-1], ordering, 'next') if rows else None
+
+    return SearchPage(rows, next_cursor=next_cursor, prev_cursor=prev_cursor, total_estimate=total_estimate)
+
+
+def cursor_querystring(request, cursor):
+    """Return the current query string with ``cursor`` replaced."""
+    query = request.GET.copy()
+    query['cursor'] = cursor
+    return query.urlencode()
+
+
+def type_facet_querystring(request, vehicle_type=None):
+    """Return the current query string with ``type`` replaced, or dropped if None."""
+    query = request.GET.copy()
+    query.pop('cursor', None)
+    query.pop('type', None)
+    if vehicle_type:
+        query['type'] = vehicle_type
+    return query.urlencode()
@@ -0,0 +1,73 @@
+from django.db.models import F, QuerySet
+from django.db.models.functions import Greatest
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+
+from .cache import invalidate_vehicle_listings
+from .models import Favorite, Vehicle, VehicleImage
+
+
+def _listing_values(vehicle):
+    return vehicle.vehicle_type, vehicle.make
+
+
+def _vehicle_values(vehicle_id, related_instance, field_name):
+    """Return (vehicle_type, make) for the vehicle behind an image."""
+    field = related_instance._meta.get_field(field_name)
+    if field.is_cached(related_instance):
+        return _listing_values(getattr(related_instance, field_name))
+    return Vehicle.objects.filter(id=vehicle_id).values_list('vehicle_type', 'make').first()
+
+
+def _deleted_directly(origin, model):
+    """True if a delete() call on ``model`` (instance or queryset) started the deletion."""
+    if isinstance(origin, QuerySet):
+        return origin.model is model
+    return isinstance(origin, model)
+
+
+@receiver(post_init, sender=Vehicle)
+def remember_listing_values(sender, instance, **kwargs):
+    # Kept so an edit that changes type or make also invalidates the old pages.
+    # Read __dict__ so instances loaded with only()/defer() are not refetched.
+    instance._loaded_listing_values = (
+        instance.__dict__.get('vehicle_type'), instance.__dict__.get('make')
+    )
+
+
+@receiver(post_save, sender=Vehicle)
+@receiver(post_delete, sender=Vehicle)
+def invalidate_vehicle_pages(sender, instance, **kwargs):
+    invalidate_vehicle_listings(instance._loaded_listing_values, _listing_values(instance))
+    instance._loaded_listing_values = _listing_values(instance)
+
+
+# Favorites are not part of the cached pages: those are only served to
+# anonymous visitors and show no favorite state or counts.
+@receiver(post_save, sender=VehicleImage)
+@receiver(post_delete, sender=VehicleImage)
+def invalidate_related_pages(sender, instance, origin=None, **kwargs):
+    if origin is not None and not _deleted_directly(origin, VehicleImage):
+        # Cascaded from a vehicle (or its owner), whose own signal invalidates
+        return
+    values = _vehicle_values(instance.vehicle_id, instance, 'vehicle')
+    if values:
+        invalidate_vehicle_listings(values)
+
+
+@receiver(post_save, sender=Favorite)
+def increment_favorite_count(sender, instance, created, **kwargs):
+    # Favorite.save() wraps the insert and this update in one transaction
+    if created:
+        Vehicle.objects.filter(id=instance.vehicle_id).update(favorite_count=F('favorite_count') + 1)
+
+
+@receiver(post_delete, sender=Favorite)
+def decrement_favorite_count(sender, instance, origin=None, **kwargs):
+    # Runs inside the deletion's transaction, cascades from User/Vehicle included
+    if _deleted_directly(origin, Vehicle):
+        # The counter goes with the vehicle
+        return
+    Vehicle.objects.filter(id=instance.vehicle_id).update(
+        favorite_count=Greatest(F('favorite_count') - 1, 0)
+    )
@@ -34,4 +34,4 @@ def is_favorite(vehicle, user):
 @register.filter
 def favorite_count(vehicle):
     """Return the number of users who have favorited this vehicle."""
-    return vehicle.favorited_by.count() 
\ No newline at end of file
+    return vehicle.favorite_count
\ No newline at end of file
@@ -0,0 +1,159 @@
+import re
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import IntegrityError
+from django.middleware.csrf import _unmask_cipher_token
+from django.template.loader import render_to_string
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from . import models, views
+from .cache import CSRF_PLACEHOLDER
+from .cards import load_card_context
+from .facets import count_facets
+from .models import Favorite, Vehicle, VehicleImage
+
+
+def create_vehicle(user, **fields):
+    values = {
+        'user': user,
+        'vehicle_type': 'car',
+        'make': 'Toyota',
+        'model': 'Corolla Axio',
+        'condition': 'used',
+        'phone_number': '0771234567',
+        'year': 2015,
+        'location': 'Colombo',
+        'price': 5_000_000,
+        'status': 'approved',
+    }
+    values.update(fields)
+    return Vehicle.objects.create(**values)
+
+
+# The manifest storage needs collectstatic, which tests do not run
+@override_settings(STATICFILES_STORAGE='django.contrib.staticfiles.storage.StaticFilesStorage')
+class VehicleCardQueryTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('card_owner', password='x')
+        for index in range(10):
+            vehicle = create_vehicle(cls.user)
+            for position in range(3):
+                VehicleImage.objects.create(vehicle=vehicle, image=f'vehicle_images/{index}-{position}.jpg')
+            if index % 2:
+                Favorite.objects.create(user=cls.user, vehicle=vehicle)
+
+    def render_cards(self, count):
+        vehicles = list(Vehicle.objects.filter(user=self.user).order_by('id')[:count])
+        # One query for the cover images and one for the favorites, however
+        # many cards there are; rendering the cards must not add any
+        with self.assertNumQueries(2):
+            cards = load_card_context(vehicles, self.user)
+            html = ''.join(
+                render_to_string('ads/includes/vehicle_card.html', {'vehicle': vehicle, 'user': self.user})
+                for vehicle in cards
+            )
+        return cards, html
+
+    def test_query_count_does_not_grow_with_cards(self):
+        for count in (1, 5, 10):
+            with self.subTest(count=count):
+                cards, html = self.render_cards(count)
+                self.assertEqual(len(cards), count)
+                self.assertEqual(html.count('class="vehicle-card'), count)
+
+    def test_cover_and_favorite_state(self):
+        cards, _ = self.render_cards(10)
+        for index, vehicle in enumerate(cards):
+            self.assertTrue(vehicle.cover_image_url.endswith(f'vehicle_images/{index}-0.jpg'))
+            self.assertEqual(vehicle.is_favorite, bool(index % 2))
+
+
+@override_settings(STATICFILES_STORAGE='django.contrib.staticfiles.storage.StaticFilesStorage')
+class ListingPageCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('listing_owner', password='x')
+        create_vehicle(cls.user)
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        render = mock.patch.object(views, 'render_search_results', wraps=views.render_search_results)
+        self.render = render.start()
+        self.addCleanup(render.stop)
+
+    def get_search_page(self, client):
+        response = client.get(reverse('ads:search'), {'make': 'toyota'})
+        self.assertEqual(response.status_code, 200)
+        content = response.content.decode()
+        self.assertNotIn(CSRF_PLACEHOLDER, content)
+        tokens = set(re.findall(r'name="csrfmiddlewaretoken" value="([^"]+)"', content))
+        self.assertTrue(tokens)
+        return tokens, client.cookies['csrftoken'].value
+
+    def test_cached_page_carries_each_visitors_own_token(self):
+        first_tokens, first_secret = self.get_search_page(Client())
+        second_tokens, second_secret = self.get_search_page(Client())
+
+        # The second visitor was served the cached page
+        self.assertEqual(self.render.call_count, 1)
+        self.assertNotEqual(first_secret, second_secret)
+        self.assertTrue(first_tokens.isdisjoint(second_tokens))
+        for token in second_tokens:
+            self.assertEqual(_unmask_cipher_token(token), second_secret)
+        for token in first_tokens:
+            self.assertEqual(_unmask_cipher_token(token), first_secret)
+
+    def test_saving_a_vehicle_invalidates_the_page(self):
+        self.get_search_page(Client())
+        self.get_search_page(Client())
+        self.assertEqual(self.render.call_count, 1)
+
+        create_vehicle(self.user, model='Premio')
+        self.get_search_page(Client())
+        self.assertEqual(self.render.call_count, 2)
+
+    @override_settings(LISTING_CACHE_ENABLED=False)
+    def test_cache_can_be_turned_off(self):
+        self.get_search_page(Client())
+        self.get_search_page(Client())
+        self.assertEqual(self.render.call_count, 2)
+
+
+class FacetCountTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create_user('facet_owner', password='x')
+        # A make of its own keeps other rows in the database out of the counts
+        for vehicle_type, fuel in (('car', 'petrol'), ('car', 'hybrid'), ('van', 'diesel')):
+            create_vehicle(user, make='Facetmake', vehicle_type=vehicle_type, fuel_type=fuel)
+
+    def test_vehicle_type_is_counted_without_its_own_filter(self):
+        counts = count_facets({'make': 'facetmake', 'type': 'car'})
+        self.assertEqual(counts['vehicle_type'], {'car': 2, 'van': 1})
+        self.assertEqual(counts['fuel'], {'petrol': 1, 'hybrid': 1})
+
+
+class VehicleIdentifierTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('identifier_owner', password='x')
+        cls.vehicle = create_vehicle(cls.user)
+
+    def test_clash_on_a_supplied_slug_is_not_retried(self):
+        with mock.patch.object(models, 'generate_ad_id', wraps=models.generate_ad_id) as generate:
+            with self.assertRaises(IntegrityError):
+                create_vehicle(self.user, slug=self.vehicle.slug)
+        self.assertEqual(generate.call_count, 1)
+
+    def test_clash_on_an_allocated_ad_id_is_retried(self):
+        taken = self.vehicle.ad_id
+        allocated = iter([taken, 'A999999'])
+        with mock.patch.object(models, 'generate_ad_id', side_effect=lambda using=None: next(allocated)):
+            vehicle = create_vehicle(self.user)
+        self.assertEqual(vehicle.ad_id, 'A999999')
+        self.assertEqual(vehicle.slug, vehicle.build_slug())
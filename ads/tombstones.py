@@ -0,0 +1,102 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import StorageTombstone, VehicleImage
+
+logger = logging.getLogger(__name__)
+
+
+def claim_tombstones(limit):
+    """
+    Lease up to ``limit`` due tombstones and return them.
+
+    A claimed tombstone is not due again until STORAGE_GC_LOCK_TIMEOUT has
+    passed, so a crashed worker's batch is picked up by the next run.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        tombstones = list(
+            StorageTombstone.objects.select_for_update(skip_locked=True)
+            .filter(purge_after__lte=now, attempts__lt=settings.STORAGE_GC_MAX_ATTEMPTS)
+            .order_by('purge_after')[:limit]
+        )
+        if tombstones:
+            StorageTombstone.objects.filter(pk__in=[tombstone.pk for tombstone in tombstones]).update(
+                purge_after=now + timedelta(seconds=settings.STORAGE_GC_LOCK_TIMEOUT),
+                attempts=F('attempts') + 1,
+            )
+    for tombstone in tombstones:
+        tombstone.attempts += 1
+    return tombstones
+
+
+def _delete_file(name):
+    # BunnyStorage.delete returns False for a missing file and for a failed
+    # call alike; only the latter leaves the file behind
+    if default_storage.delete(name) is False and default_storage.exists(name):
+        raise OSError(f'Storage did not delete {name}')
+
+
+def _names_in_use(names):
+    """
+    Return the ``names`` a VehicleImage row still references, as its image or
+    as one of its variants, by the rule the ads_vehicleimage trigger buries
+    files with (ads_vehicleimage_files, migration 0031).
+    """
+    table = connection.ops.quote_name(VehicleImage._meta.db_table)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'SELECT DISTINCT file FROM {table}, ads_vehicleimage_files(image, variants) AS file '
+            'WHERE file = ANY(%s)',
+            [names],
+        )
+        return {name for name, in cursor.fetchall()}
+
+
+def purge(tombstones, workers=None):
+    """
+    Delete the files of claimed tombstones concurrently and drop the rows of
+    the ones that are gone. Failures are retried with a doubling delay until
+    STORAGE_GC_MAX_ATTEMPTS. Returns the number of files purged.
+    """
+    if not tombstones:
+        return 0
+    # A name written back to a row since it was queued is still in use
+    in_use = _names_in_use([tombstone.name for tombstone in tombstones])
+
+    def attempt(tombstone):
+        if tombstone.name in in_use:
+            return tombstone, None
+        try:
+            _delete_file(tombstone.name)
+        except Exception as e:
+            return tombstone, e
+        return tombstone, None
+
+    purged = []
+    with ThreadPoolExecutor(max_workers=workers or settings.STORAGE_GC_WORKERS) as executor:
+        for tombstone, error in executor.map(attempt, tombstones):
+            if error is None:
+                purged.append(tombstone.pk)
+            else:
+                _record_failure(tombstone, error)
+    StorageTombstone.objects.filter(pk__in=purged).delete()
+    return len(purged)
+
+
+def _record_failure(tombstone, error):
+    logger.warning('Could not delete %s (attempt %s): %s', tombstone.name, tombstone.attempts, error)
+    delay = settings.STORAGE_GC_RETRY_DELAY * 2 ** (tombstone.attempts - 1)
+    StorageTombstone.objects.filter(pk=tombstone.pk).update(
+        purge_after=timezone.now() + timedelta(seconds=delay),
+        last_error=str(error),
+    )
+    if tombstone.attempts >= settings.STORAGE_GC_MAX_ATTEMPTS:
+        logger.error('Giving up on deleting %s after %s attempts', tombstone.name, tombstone.attempts)
@@ -0,0 +1,128 @@
+import logging
+import os
+import uuid
+
+from django.conf import settings
+from django.core.files.base import File
+from django.core.files.storage import FileSystemStorage
+from django.utils.functional import LazyObject
+
+from . import jobs
+from .images import generate_derivatives
+from .models import VehicleImage
+
+logger = logging.getLogger(__name__)
+
+PROCESS_IMAGE_JOB = 'process_vehicle_image'
+
+
+class StagingStorage(LazyObject):
+    def _setup(self):
+        self._wrapped = FileSystemStorage(location=settings.UPLOAD_STAGING_ROOT)
+
+
+staging_storage = StagingStorage()
+
+
+def image_job_key(vehicle_image_id):
+    return f'vehicle-image:{vehicle_image_id}'
+
+
+def stage_vehicle_image(vehicle_image):
+    """
+    Save an image coming from VehicleImageFormSet(commit=False) without
+    touching the media storage.
+
+    The upload is written to the local staging directory and a job is queued
+    to copy it to storage and render its variants. A replaced image keeps
+    showing its current file until the job has finished.
+    """
+    upload = vehicle_image.image
+    staged_name = staging_storage.save(
+        f'{uuid.uuid4().hex}_{os.path.basename(upload.name)}', upload
+    )
+
+    current_image = ''
+    if vehicle_image.pk:
+        current_image = VehicleImage.objects.filter(pk=vehicle_image.pk).values_list('image', flat=True).first() or ''
+    previous_staged = vehicle_image.staged_name
+
+    vehicle_image.image = current_image
+    vehicle_image.staged_name = staged_name
+    vehicle_image.status = 'pending'
+    try:
+        vehicle_image.save()
+    except Exception:
+        # No row points at the staged file, so no job would ever remove it
+        staging_storage.delete(staged_name)
+        raise
+
+    if previous_staged:
+        staging_storage.delete(previous_staged)
+    jobs.enqueue_on_commit(
+        PROCESS_IMAGE_JOB,
+        image_job_key(vehicle_image.pk),
+        {'vehicle_image_id': vehicle_image.pk, 'staged_name': staged_name},
+    )
+    return vehicle_image
+
+
+def stage_vehicle_images(vehicle_images):
+    return [stage_vehicle_image(vehicle_image) for vehicle_image in vehicle_images]
+
+
+def discard_staged_images(vehicle):
+    """Delete the staged uploads of an ad that is being thrown away, before deleting it."""
+    staged_names = VehicleImage.objects.filter(vehicle=vehicle).exclude(staged_name='').values_list(
+        'staged_name', flat=True
+    )
+    for staged_name in staged_names:
+        staging_storage.delete(staged_name)
+
+
+def _mark_failed(payload, error):
+    VehicleImage.objects.filter(
+        pk=payload['vehicle_image_id'], staged_name=payload['staged_name']
+    ).update(status='failed')
+
+
+@jobs.register(PROCESS_IMAGE_JOB, on_failure=_mark_failed)
+def process_vehicle_image(payload):
+    """Copy a staged upload to the media storage and render its variants."""
+    staged_name = payload['staged_name']
+    vehicle_image = VehicleImage.objects.filter(pk=payload['vehicle_image_id']).first()
+    if vehicle_image is None:
+        # The image or its ad was deleted before the job ran
+        staging_storage.delete(staged_name)
+        return
+    if vehicle_image.staged_name != staged_name:
+        # Already processed, or replaced by a newer upload with its own run
+        return
+
+    field = vehicle_image.image
+    storage = field.storage
+    with staging_storage.open(staged_name) as staged:
+        name = field.field.generate_filename(vehicle_image, staged_name.split('_', 1)[1])
+        name = storage.save(name, File(staged), max_length=field.field.max_length)
+
+    updated = VehicleImage.objects.filter(pk=vehicle_image.pk, staged_name=staged_name).update(
+        image=name, staged_name='', status='ready', variants={}
+    )
+    if not updated:
+        # Replaced or deleted while uploading
+        storage.delete(name)
+        return
+
+    # The replaced image and variants were queued for deletion by the
+    # ads_vehicleimage trigger (see StorageTombstone)
+    vehicle_image.image, vehicle_image.staged_name, vehicle_image.status = name, '', 'ready'
+    vehicle_image.variants = {}
+    # Render from the staged copy instead of downloading the upload again.
+    # Saves the variants, which also refreshes the cached listing pages.
+    try:
+        with staging_storage.open(staged_name) as staged:
+            generate_derivatives(vehicle_image, staged)
+    except Exception:
+        # Pages fall back to the original upload
+        logger.exception('Could not generate derivatives for image %s', vehicle_image.pk)
+    staging_storage.delete(staged_name)
@@ -1,17 +1,47 @@
+import json
+
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.db.models import Q
-from .models import Vehicle, Favorite
+from .models import Vehicle
 from .forms import VehicleForm, VehicleImageFormSet
+from .cache import cache_listing_page, listing_namespaces
+from .cards import load_card_context
+from .facets import get_facets
+from .favorites import set_favorite
+from .uploads import discard_staged_images, stage_vehicle_images
+from .search import (
+    get_search_params, filter_vehicles, order_vehicles, paginate_vehicles, attach_snippets, cursor_querystring,
+    type_facet_querystring,
+)
 from django.http import JsonResponse
-import re
+from django.urls import reverse
 
 # Create your views here.
 
+# Map URL slugs to actual vehicle types
+VEHICLE_TYPE_SLUGS = {
+    'cars': 'car',
+    'motorcycles': 'motorcycle',
+    'three-wheelers': 'three-wheeler',
+    'vans': 'van',
+    'suvs': 'suv',
+    'pickups': 'pickup',
+    'buses': 'bus',
+    'lorries': 'lorry',
+    'heavy-duty': 'heavy-duty',
+    'tractors': 'tractor',
+    'bicycles': 'bicycle',
+    'others': 'other'
+}
+
+VEHICLE_TYPE_PATHS = {value: slug for slug, value in VEHICLE_TYPE_SLUGS.items()}
+
+@cache_listing_page(lambda request: listing_namespaces())
 def home_view(request):
     # Get urgent vehicle listings that are approved
     urgent_vehicles = Vehicle.objects.filter(status='approved', is_urgent=True).order_by('-created_at')
+    urgent_vehicles = load_card_context(urgent_vehicles, request.user)
     return render(request, 'home.html', {
         'urgent_vehicles': urgent_vehicles
     })
@@ -19,73 +49,39 @@ def home_view(request):
 def ad_list(request):
     return redirect('home')
 
+@cache_listing_page(lambda request: listing_namespaces(request.GET.get('type'), request.GET.get('make')))
 def search_view(request):
-    # Get all search parameters from the request
-    vehicle_type = request.GET.get('type')
-    make = request.GET.get('make')
-    model = request.GET.get('model')
-    condition = request.GET.get('condition')
-    min_price = request.GET.get('min_price')
-    max_price = request.GET.get('max_price')
-    city = request.GET.get('city')
-    fuel = request.GET.get('fuel')
+    params = get_search_params(request)
+    return render_search_results(request, params)
 
-    # Start with all approved vehicles
-    vehicles = Vehicle.objects.filter(status='approved')
-
-    # Apply filters based on search parameters
-    if vehicle_type:
-        vehicles = vehicles.filter(vehicle_type__iexact=vehicle_type)
-    
-    if make:
-        vehicles = vehicles.filter(make__iexact=make)
-    
-    if model:
-        normalized = re.sub(r'[^A-Za-z0-9]', '', model.lower())
-        # Build a regex pattern that allows any number of spaces or hyphens between letters
-        regex_parts = [re.escape(ch) + r'[-\s]*' for ch in normalized]
-        regex_pattern = ''.join(regex_parts)
-        vehicles = vehicles.filter(model__iregex=regex_pattern)
-    
-    if condition and condition != 'any':
-        vehicles = vehicles.filter(condition=condition)
-    
-    if min_price:
-        vehicles = vehicles.filter(price__gte=min_price)
-    
-    if max_price:
-        vehicles = vehicles.filter(price__lte=max_price)
-    
-    if city and city != 'any':
-        if city.startswith('any_'):
-            # If it's "any city in province", extract the province name
-            province = city.replace('any_', '')
-            # You would need to map this to your actual location data structure
-            # This is a simplified example
-            vehicles = vehicles.filter(location__icontains=province)
-        else:
-            vehicles = vehicles.filter(location__icontains=city)
-    
-    if fuel and fuel != 'any':
-        vehicles = vehicles.filter(fuel_type=fuel)
+def render_search_results(request, params):
+    """Render one keyset-paginated page of search results for the given filters."""
+    vehicles, ordering = order_vehicles(filter_vehicles(params), params)
+    page = paginate_vehicles(vehicles, cursor=request.GET.get('cursor'), ordering=ordering)
+    page.object_list = load_card_context(page.object_list, request.user)
+    attach_snippets(page.object_list, params)
 
-    # Order by most recent first
-    vehicles = vehicles.order_by('-created_at')
+    facets = get_facets(params)
+    for option in facets['vehicle_type']:
+        option['url'] = vehicle_type_url(request, option['value'])
 
     return render(request, 'ads/search_results.html', {
-        'vehicles': vehicles,
-        'search_params': {
-            'type': vehicle_type,
-            'make': make,
-            'model': model,
-            'condition': condition,
-            'min_price': min_price,
-            'max_price': max_price,
-            'city': city,
-            'fuel': fuel
-        }
+        'vehicles': page.object_list,
+        'page': page,
+        'next_query': cursor_querystring(request, page.next_cursor) if page.has_next() else None,
+        'prev_query': cursor_querystring(request, page.prev_cursor) if page.has_previous() else None,
+        'search_params': params,
+        'facets': facets,
+        'all_types_url': vehicle_type_url(request),
     })
 
+def vehicle_type_url(request, vehicle_type=None):
+    """Link to the results for ``vehicle_type`` (any type if None), keeping the other filters."""
+    slug = VEHICLE_TYPE_PATHS.get(vehicle_type)
+    url = reverse('ads:vehicle_type', args=[slug]) if slug else reverse('ads:search')
+    query = type_facet_querystring(request, None if slug else vehicle_type)
+    return f'{url}?{query}' if query else url
+
 def ad_detail(request, pk):
     vehicle = get_object_or_404(Vehicle, pk=pk)
     # Allow viewing if:
@@ -94,7 +90,9 @@ def ad_detail(request, pk):
     # 3. User is an admin/superuser
     if vehicle.status == 'approved' or vehicle.user == request.user or request.user.is_superuser:
         return render(request, 'ads/ad_detail.html', {
-            'vehicle': vehicle
+            'vehicle': vehicle,
+            # Uploads still waiting for the background job have no file yet
+            'images': [image for image in vehicle.images.all() if image.image],
         })
     messages.error(request, 'This ad is not available.')
     return redirect('home')
@@ -114,15 +112,17 @@ def create_ad(request):
                 vehicle.save()
                 
                 # Save images
+                # Keep the uploads locally; run_jobs copies them to storage
                 image_formset.instance = vehicle
-                image_formset.save()
+                stage_vehicle_images(image_formset.save(commit=False))
                 
                 messages.success(request, 'Your vehicle ad has been submitted for review. You will be notified once it is approved.')
                 return redirect('users:my_ads')
             except Exception as e:
                 messages.error(request, f'Error creating ad: {str(e)}')
-                # Delete the vehicle if image upload fails
+                # Delete the vehicle and any uploads already staged if image upload fails
                 if vehicle.id:
+                    discard_staged_images(vehicle)
                     vehicle.delete()
         else:
             # Show specific form errors
@@ -176,7 +176,7 @@ def edit_ad(request, pk):
             images = image_formset.save(commit=False)
             for image in images:
                 image.vehicle = vehicle
-                image.save()
+            stage_vehicle_images(images)
                 
             # Delete marked images
             for image_form in image_formset.deleted_forms:
@@ -203,9 +203,7 @@ def delete_ad(request, pk):
     vehicle = get_object_or_404(Vehicle, pk=pk, user=request.user)
     
     if request.method == 'POST':
-        # Delete associated images first
-        vehicle.images.all().delete()
-        # Delete the vehicle
+        # Image rows go with the cascade; their files are purged in the background
         vehicle.delete()
         messages.success(request, 'Your ad has been deleted successfully.')
         return redirect('users:my_ads')
@@ -216,105 +214,44 @@ def delete_ad(request, pk):
 
 @login_required
 def toggle_favorite(request, vehicle_id):
+    """
+    Set whether the vehicle is one of the user's favorites.
+
+    The body is ``{"is_favorite": true|false}``; sending the state the
+    favorite is already in changes nothing. Without it the favorite is
+    flipped, as older clients expect.
+    """
+    if request.method != 'POST':
+        return JsonResponse({'status': 'error', 'message': 'Invalid request method'}, status=405)
     try:
-        vehicle = Vehicle.objects.get(id=vehicle_id)
-        favorite, created = Favorite.objects.get_or_create(user=request.user, vehicle=vehicle)
-        
-        if not created:
-            favorite.delete()
-            is_favorite = False
-        else:
-            is_favorite = True
-            
-        return JsonResponse({
-            'status': 'success',
-            'is_favorite': is_favorite
-        })
-    except Vehicle.DoesNotExist:
+        data = json.loads(request.body or '{}')
+    except json.JSONDecodeError:
+        return JsonResponse({'status': 'error', 'message': 'Invalid JSON'}, status=400)
+
+    desired = data.get('is_favorite') if isinstance(data, dict) else None
+    if isinstance(desired, str):
+        desired = desired.lower() == 'true'
+
+    result = set_favorite(request.user.id, vehicle_id, desired)
+    if result is None:
         return JsonResponse({
             'status': 'error',
             'message': 'Vehicle not found'
         }, status=404)
 
-def vehicle_type_view(request, vehicle_type):
-    # Map URL slugs to actual vehicle types
-    type_mapping = {
-        'cars': 'car',
-        'motorcycles': 'motorcycle',
-        'three-wheelers': 'three-wheeler',
-        'vans': 'van',
-        'suvs': 'suv',
-        'pickups': 'pickup',
-        'buses': 'bus',
-        'lorries': 'lorry',
-        'heavy-duty': 'heavy-duty',
-        'tractors': 'tractor',
-        'bicycles': 'bicycle',
-        'others': 'other'
-    }
+    is_favorite, favorite_count = result
+    return JsonResponse({
+        'status': 'success',
+        'is_favorite': is_favorite,
+        'favorite_count': favorite_count,
+    })
 
+@cache_listing_page(lambda request, vehicle_type: listing_namespaces(VEHICLE_TYPE_SLUGS.get(vehicle_type)))
+def vehicle_type_view(request, vehicle_type):
     # Get the actual vehicle type from the mapping
-    actual_type = type_mapping.get(vehicle_type)
+    actual_type = VEHICLE_TYPE_SLUGS.get(vehicle_type)
     if not actual_type:
         return redirect('ads:search')  # Redirect to main search if type not found
 
-    # Start with approved vehicles
-    vehicles = Vehicle.objects.filter(status='approved')
-
-    # Apply vehicle type filter
-    vehicles = vehicles.filter(vehicle_type=actual_type)
-
-    # Get other search parameters
-    make = request.GET.get('make')
-    model = request.GET.get('model')
-    condition = request.GET.get('condition')
-    min_price = request.GET.get('min_price')
-    max_price = request.GET.get('max_price')
-    city = request.GET.get('city')
-    fuel = request.GET.get('fuel')
-
-    # Apply other filters
-    if make:
-        vehicles = vehicles.filter(make__iexact=make)
-    
-    if model:
-        normalized = re.sub(r'[^A-Za-z0-9]', '', model.lower())
-        regex_parts = [re.escape(ch) + r'[-\s]*' for ch in normalized]
-        regex_pattern = ''.join(regex_parts)
-        vehicles = vehicles.filter(model__iregex=regex_pattern)
-    
-    if condition and condition != 'any':
-        vehicles = vehicles.filter(condition=condition)
-    
-    if min_price:
-        vehicles = vehicles.filter(price__gte=min_price)
-    
-    if max_price:
-        vehicles = vehicles.filter(price__lte=max_price)
-    
-    if city and city != 'any':
-        if city.startswith('any_'):
-            province = city.replace('any_', '')
-            vehicles = vehicles.filter(location__icontains=province)
-        else:
-            vehicles = vehicles.filter(location__icontains=city)
-    
-    if fuel and fuel != 'any':
-        vehicles = vehicles.filter(fuel_type=fuel)
-
-    # Order by most recent first
-    vehicles = vehicles.order_by('-created_at')
-
-    return render(request, 'ads/search_results.html', {
-        'vehicles': vehicles,
-        'search_params': {
-            'type': actual_type,
-            'make': make,
-            'model': model,
-            'condition': condition,
-            'min_price': min_price,
-            'max_price': max_price,
-            'city': city,
-            'fuel': fuel
-        }
-    })
+    params = get_search_params(request, vehicle_type=actual_type)
+    return render_search_results(request, params)
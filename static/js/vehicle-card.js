@@ -2,16 +2,21 @@
 function toggleFavorite(button) {
     const vehicleId = button.dataset.vehicleId;
     
+    // Send the state we want, so a double tap cannot flip it back
+    const isFavorite = !button.classList.contains('active');
+    
     fetch(`/ads/toggle-favorite/${vehicleId}/`, {
         method: 'POST',
         headers: {
             'X-CSRFToken': document.querySelector('[name=csrfmiddlewaretoken]').value,
+            'Content-Type': 'application/json',
         },
+        body: JSON.stringify({ is_favorite: isFavorite }),
     })
     .then(response => response.json())
     .then(data => {
         if (data.status === 'success') {
-            button.classList.toggle('active');
+            button.classList.toggle('active', data.is_favorite);
         }
     });
 }
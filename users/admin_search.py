@@ -0,0 +1,61 @@
+import re
+
+from django.db.models import Q
+
+# Pasted identifiers; the dashboard shows ad ids as "#A123456"
+AD_ID_PATTERN = re.compile(r'^#?(A\d{6})$', re.IGNORECASE)
+UNIQUE_ID_PATTERN = re.compile(r'^#?U(\d{6})$', re.IGNORECASE)
+PHONE_PATTERN = re.compile(r'^\+?[\d\s-]{9,16}$')
+
+
+def phone_numbers(query):
+    """The ways a Sri Lankan number may have been typed into an ad: 0771234567, +94771234567, 94771234567."""
+    digits = re.sub(r'\D', '', query)
+    if digits.startswith('94') and len(digits) == 11:
+        digits = f'0{digits[2:]}'
+    numbers = {query.strip(), digits}
+    if digits.startswith('0') and len(digits) == 10:
+        numbers.update((f'+94{digits[1:]}', f'94{digits[1:]}'))
+    return sorted(numbers)
+
+
+def search_vehicles(queryset, query):
+    """
+    Filter the admin dashboard ad lists by ``query``.
+
+    Ad ids, user ids and phone numbers are answered with an equality lookup on
+    an indexed column. Anything else is a substring match on
+    Vehicle.admin_search_text, served by its trigram index.
+    """
+    query = query.strip()
+    match = AD_ID_PATTERN.match(query)
+    if match:
+        return queryset.filter(ad_id=match.group(1).upper())
+    match = UNIQUE_ID_PATTERN.match(query)
+    if match:
+        return queryset.filter(user__userprofile__unique_id=f'#U{match.group(1)}')
+    if PHONE_PATTERN.match(query):
+        numbers = phone_numbers(query)
+        matches = queryset.filter(Q(phone_number__in=numbers) | Q(whatsapp_number__in=numbers))
+        if matches.exists():
+            return matches
+        # Stored in some other format, e.g. with spaces; fall through
+    return queryset.filter(admin_search_text__contains=query.lower())
+
+
+def search_users(queryset, query):
+    """Filter the registered users list by ``query``; user ids are an exact lookup."""
+    query = query.strip()
+    match = UNIQUE_ID_PATTERN.match(query)
+    if match:
+        return queryset.filter(userprofile__unique_id=f'#U{match.group(1)}')
+    return queryset.filter(
+        Q(username__icontains=query) |
+        Q(first_name__icontains=query) |
+        Q(last_name__icontains=query) |
+        Q(email__icontains=query) |
+        Q(userprofile__contact_phone__icontains=query) |
+        Q(userprofile__whatsapp_number__icontains=query) |
+        Q(userprofile__unique_id__icontains=query) |
+        Q(shop__company_name__icontains=query)
+    ).distinct()
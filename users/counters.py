@@ -0,0 +1,125 @@
+"""
+Running totals for the admin dashboard: users and ads per status.
+
+Signals adjust the counters as rows are created, deleted or change status, so
+the dashboard reads one small table instead of counting the big ones. Bulk
+updates bypass the signals and adjust the counters themselves (see
+sweep_expirations); anything else that slips through, such as an instance
+saved over a status changed since it was loaded, is corrected by the nightly
+``reconcile_admin_counters`` command.
+"""
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+from django.db.models import Count
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+
+from ads.models import Vehicle
+
+from .models import AdminCounter
+
+USERS = 'users'
+
+
+def vehicle_counter(status):
+    return f'vehicles:{status}'
+
+
+VEHICLE_COUNTERS = [vehicle_counter(status) for status, _ in Vehicle.STATUS_CHOICES]
+COUNTERS = [USERS, *VEHICLE_COUNTERS]
+
+
+def _upsert(values, increment):
+    """Add ``values`` (name -> number) to the counters, or set them, in one statement."""
+    if not values:
+        return
+    table = connection.ops.quote_name(AdminCounter._meta.db_table)
+    new_value = f'{table}.value + EXCLUDED.value' if increment else 'EXCLUDED.value'
+    rows = ', '.join(['(%s, %s, now())'] * len(values))
+    # Rows are locked in VALUES order. Sorting by name makes concurrent
+    # status moves (pending -> approved and approved -> pending) take the
+    # locks in the same order, so they cannot deadlock.
+    params = [item for name, value in sorted(values.items()) for item in (name, value)]
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {table} (name, value, updated_at) VALUES {rows} '
+            f'ON CONFLICT (name) DO UPDATE SET value = {new_value}, updated_at = now()',
+            params,
+        )
+
+
+def adjust(changes):
+    """Add to counters by name, e.g. ``adjust({vehicle_counter('pending'): -1})``."""
+    _upsert({name: delta for name, delta in changes.items() if delta}, increment=True)
+
+
+def get_counters():
+    """All counters in one query; a counter that was never written reads 0."""
+    counters = dict.fromkeys(COUNTERS, 0)
+    counters.update(AdminCounter.objects.filter(name__in=COUNTERS).values_list('name', 'value'))
+    return counters
+
+
+def count_actual():
+    """The true totals, from one COUNT per table."""
+    actual = dict.fromkeys(COUNTERS, 0)
+    actual[USERS] = User.objects.filter(is_superuser=False).count()
+    for status, total in Vehicle.objects.order_by().values_list('status').annotate(total=Count('*')):
+        actual[vehicle_counter(status)] = total
+    return actual
+
+
+def reconcile():
+    """
+    Recount every counter and store the true values. Returns the counters
+    that were off, as name -> (stored, actual).
+    """
+    with transaction.atomic():
+        # Make sure every row exists, then lock them all: signal updates
+        # committed before the lock are counted below, later ones wait
+        _upsert(dict.fromkeys(COUNTERS, 0), increment=True)
+        stored = dict(
+            AdminCounter.objects.select_for_update().filter(name__in=COUNTERS)
+            .order_by('name').values_list('name', 'value')
+        )
+        actual = count_actual()
+        drifted = {name: (stored[name], value) for name, value in actual.items() if stored[name] != value}
+        _upsert({name: value for name, (_, value) in drifted.items()}, increment=False)
+    return drifted
+
+
+@receiver(post_init, sender=Vehicle)
+def remember_status(sender, instance, **kwargs):
+    # Read __dict__ so instances loaded with only()/defer() are not refetched
+    instance._loaded_status = instance.__dict__.get('status')
+
+
+@receiver(post_save, sender=Vehicle)
+def count_vehicle_status(sender, instance, created, update_fields=None, **kwargs):
+    if created:
+        adjust({vehicle_counter(instance.status): 1})
+    elif update_fields is None or 'status' in update_fields:
+        if instance._loaded_status is not None and instance._loaded_status != instance.status:
+            adjust({vehicle_counter(instance._loaded_status): -1, vehicle_counter(instance.status): 1})
+    else:
+        # The status was not written, so the row still has the loaded one
+        return
+    instance._loaded_status = instance.status
+
+
+@receiver(post_delete, sender=Vehicle)
+def uncount_vehicle(sender, instance, **kwargs):
+    # Cascades from a deleted user included; each deleted row fires this
+    adjust({vehicle_counter(instance._loaded_status or instance.status): -1})
+
+
+@receiver(post_save, sender=User)
+def count_user(sender, instance, created, **kwargs):
+    if created and not instance.is_superuser:
+        adjust({USERS: 1})
+
+
+@receiver(post_delete, sender=User)
+def uncount_user(sender, instance, **kwargs):
+    if not instance.is_superuser:
+        adjust({USERS: -1})
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from users.counters import count_actual, get_counters, reconcile
+
+
+class Command(BaseCommand):
+    help = 'Recount the admin dashboard counters from the user and ad tables and fix any drift (run nightly)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Only report the counters that are off')
+
+    def handle(self, *args, **options):
+        if options['dry_run']:
+            stored = get_counters()
+            drifted = {name: (stored[name], value) for name, value in count_actual().items() if stored[name] != value}
+        else:
+            drifted = reconcile()
+
+        for name, (stored_value, actual) in sorted(drifted.items()):
+            self.stdout.write(f'{name}: {stored_value} -> {actual}')
+        verb = 'would be fixed' if options['dry_run'] else 'fixed'
+        self.stdout.write(self.style.SUCCESS(f'{len(drifted)} counters {verb}'))
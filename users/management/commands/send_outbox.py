@@ -0,0 +1,45 @@
+import time
+
+from django.conf import settings
+from django.core.mail import get_connection
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from users import outbox
+
+
+class Command(BaseCommand):
+    help = 'Deliver queued emails over a reused SMTP connection and roll signups into admin digests'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Exit once the outbox is empty instead of polling')
+        parser.add_argument('--batch', type=int, default=settings.EMAIL_BATCH_SIZE, help='Emails claimed per poll')
+        parser.add_argument('--sleep', type=float, default=2.0, help='Seconds to wait when the outbox is empty')
+
+    def handle(self, *args, **options):
+        # Kept open while there is mail to send and closed when the outbox is idle
+        connection = get_connection()
+        last_purge = 0
+        try:
+            while True:
+                close_old_connections()
+                if outbox.queue_admin_digest():
+                    self.stdout.write('Queued admin digest')
+                if time.monotonic() - last_purge > 3600:
+                    outbox.purge_sent()
+                    last_purge = time.monotonic()
+
+                emails = outbox.claim_emails(options['batch'])
+                if emails:
+                    sent = outbox.deliver(emails, connection)
+                    self.stdout.write(f'Sent {sent}/{len(emails)} emails')
+                    continue
+
+                connection.close()
+                if options['once']:
+                    break
+                time.sleep(options['sleep'])
+        except KeyboardInterrupt:
+            pass
+        finally:
+            connection.close()
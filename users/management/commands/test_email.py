@@ -1,5 +1,6 @@
 from django.core.management.base import BaseCommand
 from django.contrib.auth.models import User
+from users.outbox import deliver_pending
 from users.utils import send_welcome_email, send_admin_notification
 
 class Command(BaseCommand):
@@ -17,7 +18,8 @@ class Command(BaseCommand):
             try:
                 user = User.objects.get(id=user_id)
                 self.stdout.write(f'Sending welcome email to user: {user.username} ({user.email})')
-                success = send_welcome_email(user)
+                # Deliver straight away instead of waiting for the send_outbox worker
+                success = send_welcome_email(user) and deliver_pending() > 0
                 if success:
                     self.stdout.write(self.style.SUCCESS('Welcome email sent successfully!'))
                 else:
@@ -35,7 +37,8 @@ class Command(BaseCommand):
                 password='testpass123'
             )
             self.stdout.write(f'Sending test welcome email to: {email}')
-            success = send_welcome_email(test_user)
+            # Deliver straight away instead of waiting for the send_outbox worker
+            success = send_welcome_email(test_user) and deliver_pending() > 0
             if success:
                 self.stdout.write(self.style.SUCCESS('Test welcome email sent successfully!'))
             else:
@@ -1,5 +1,7 @@
 from django.core.management.base import BaseCommand
 from django.contrib.auth.models import User
+from users.outbox import deliver_pending
+from users.password_reset import issue_otp
 from users.utils import send_otp_email
 
 class Command(BaseCommand):
@@ -19,11 +21,11 @@ class Command(BaseCommand):
                 self.stdout.write(f'Generating OTP for user: {user.username} ({user.email})')
                 
                 # Generate OTP
-                otp = user.userprofile.generate_otp()
+                otp = issue_otp(user)
                 self.stdout.write(f'Generated OTP: {otp}')
                 
-                # Send OTP email
-                success = send_otp_email(user, otp)
+                # Send OTP email now rather than waiting for the send_outbox worker
+                success = send_otp_email(user, otp) and deliver_pending() > 0
                 if success:
                     self.stdout.write(self.style.SUCCESS('OTP email sent successfully!'))
                 else:
@@ -38,11 +40,11 @@ class Command(BaseCommand):
                 self.stdout.write(f'Generating OTP for user: {user.username} ({user.email})')
                 
                 # Generate OTP
-                otp = user.userprofile.generate_otp()
+                otp = issue_otp(user)
                 self.stdout.write(f'Generated OTP: {otp}')
                 
-                # Send OTP email
-                success = send_otp_email(user, otp)
+                # Send OTP email now rather than waiting for the send_outbox worker
+                success = send_otp_email(user, otp) and deliver_pending() > 0
                 if success:
                     self.stdout.write(self.style.SUCCESS('OTP email sent successfully!'))
                 else:
@@ -0,0 +1,16 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0008_outbound_email'),
+    ]
+
+    operations = [
+        # Block numbers for ads.identifiers.profile_ids
+        migrations.RunSQL(
+            'CREATE SEQUENCE IF NOT EXISTS users_userprofile_unique_id_seq',
+            'DROP SEQUENCE IF EXISTS users_userprofile_unique_id_seq',
+        ),
+    ]
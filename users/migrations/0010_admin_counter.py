@@ -0,0 +1,35 @@
+# Generated by Django 5.0.2 on 2026-10-17 19:39
+
+from django.db import migrations, models
+
+
+def seed_counters(apps, schema_editor):
+    # Same names as users.counters; later drift is fixed by reconcile_admin_counters
+    User = apps.get_model('auth', 'User')
+    Vehicle = apps.get_model('ads', 'Vehicle')
+    AdminCounter = apps.get_model('users', 'AdminCounter')
+    values = {'users': User.objects.filter(is_superuser=False).count()}
+    for status in ('pending', 'approved', 'rejected', 'expired'):
+        values[f'vehicles:{status}'] = 0
+    for status, total in Vehicle.objects.order_by().values_list('status').annotate(total=models.Count('*')):
+        values[f'vehicles:{status}'] = total
+    AdminCounter.objects.bulk_create([AdminCounter(name=name, value=value) for name, value in values.items()])
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ads', '0032_vehicle_admin_search_text'),
+        ('users', '0009_userprofile_unique_id_sequence'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AdminCounter',
+            fields=[
+                ('name', models.CharField(max_length=50, primary_key=True, serialize=False)),
+                ('value', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.RunPython(seed_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.0.2 on 2026-10-17 19:40
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0010_admin_counter'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='userprofile',
+            name='reset_otp',
+        ),
+        migrations.RemoveField(
+            model_name='userprofile',
+            name='reset_otp_expiry',
+        ),
+        migrations.CreateModel(
+            name='PasswordResetToken',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('email', models.EmailField(max_length=254)),
+                ('otp_hash', models.CharField(max_length=64)),
+                ('expires_at', models.DateTimeField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['email', 'otp_hash'], name='reset_token_lookup_idx'), models.Index(fields=['expires_at'], name='reset_token_expires_idx')],
+            },
+        ),
+    ]
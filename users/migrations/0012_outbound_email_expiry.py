@@ -0,0 +1,23 @@
+# Generated by Django 5.0.2 on 2026-10-17 19:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0011_password_reset_token'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='outboundemail',
+            name='expires_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='outboundemail',
+            name='sensitive',
+            field=models.BooleanField(default=False),
+        ),
+    ]
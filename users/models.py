@@ -1,10 +1,10 @@
-from django.db import models
+from django.db import IntegrityError, models, router, transaction
 from django.contrib.auth.models import User
 from django.db.models.signals import post_save
 from django.dispatch import receiver
 from django.utils import timezone
-from datetime import timedelta
-import random
+
+from ads.identifiers import MAX_ATTEMPTS, is_unique_violation, profile_ids
 
 # Create your models here.
 
@@ -29,49 +29,25 @@ class UserProfile(models.Model):
     premium_badge_end_date = models.DateField(null=True, blank=True)
     has_trusted_badge = models.BooleanField(default=False)
     trusted_badge_end_date = models.DateField(null=True, blank=True)
-    
-    # Password reset OTP fields
-    reset_otp = models.CharField(max_length=6, null=True, blank=True)
-    reset_otp_expiry = models.DateTimeField(null=True, blank=True)
 
     def save(self, *args, **kwargs):
-        if not self.unique_id:
-            # Generate a unique ID like #U123456
-            while True:
-                new_id = f'#U{random.randint(100000, 999999)}'
-                if not UserProfile.objects.filter(unique_id=new_id).exists():
-                    self.unique_id = new_id
-                    break
-        super().save(*args, **kwargs)
+        if self.unique_id:
+            super().save(*args, **kwargs)
+            return
+        # Allocate an ID like #U123456; retry if it clashes with an older random one
+        using = kwargs.get('using') or router.db_for_write(type(self), instance=self)
+        for attempt in range(1, MAX_ATTEMPTS + 1):
+            self.unique_id = f'#U{profile_ids.next(using)}'
+            try:
+                with transaction.atomic(using=using):
+                    super().save(*args, **kwargs)
+                return
+            except IntegrityError as e:
+                if attempt == MAX_ATTEMPTS or not is_unique_violation(e, 'unique_id'):
+                    raise
 
     def __str__(self):
         return f"{self.user.username} Profile"
-    
-    def generate_otp(self):
-        """Generate a 6-digit OTP and set expiry (10 minutes)"""
-        self.reset_otp = str(random.randint(100000, 999999))
-        self.reset_otp_expiry = timezone.now() + timedelta(minutes=10)
-        self.save()
-        return self.reset_otp
-    
-    def verify_otp(self, otp):
-        """Verify if the provided OTP is correct and not expired"""
-        if not self.reset_otp or not self.reset_otp_expiry:
-            return False
-        
-        if timezone.now() > self.reset_otp_expiry:
-            return False
-        
-        if self.reset_otp == otp:
-            return True
-        
-        return False
-    
-    def clear_otp(self):
-        """Clear the OTP after successful use"""
-        self.reset_otp = None
-        self.reset_otp_expiry = None
-        self.save()
 
 class Shop(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE)
@@ -88,6 +64,82 @@ class Shop(models.Model):
     def __str__(self):
         return f"{self.company_name} Shop"
 
+class OutboundEmail(models.Model):
+    """An email waiting in the outbox, delivered by the ``send_outbox`` worker."""
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('sending', 'Sending'),
+        ('sent', 'Sent'),
+        ('dead', 'Dead'),  # Gave up after max_attempts, kept for inspection
+    ]
+
+    kind = models.CharField(max_length=50)
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    html_body = models.TextField(blank=True, default='')
+    from_email = models.CharField(max_length=255)
+    to = models.JSONField(default=list)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=5)
+    send_after = models.DateTimeField(default=timezone.now)
+    # Not sent after this point (e.g. a reset code that stopped working); marked dead instead
+    expires_at = models.DateTimeField(null=True, blank=True)
+    # The body carries a secret: it is blanked once the email is sent or dead
+    sensitive = models.BooleanField(default=False)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # The worker sends the oldest due emails first
+            models.Index(
+                fields=['send_after'],
+                condition=models.Q(status='pending'),
+                name='outbox_pending_send_after_idx',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} to {', '.join(self.to)} ({self.status})"
+
+class AdminDigestEntry(models.Model):
+    """A signup the admins have not been told about yet, see users.outbox.queue_admin_digest."""
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Digest entry for {self.user.username}"
+
+class PasswordResetToken(models.Model):
+    """A password reset code waiting to be entered, see users.password_reset."""
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    email = models.EmailField()
+    otp_hash = models.CharField(max_length=64)  # HMAC of the code; the code itself is only emailed
+    expires_at = models.DateTimeField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['email', 'otp_hash'], name='reset_token_lookup_idx'),
+            # Expired tokens are purged whenever a new one is issued
+            models.Index(fields=['expires_at'], name='reset_token_expires_idx'),
+        ]
+
+    def __str__(self):
+        return f"Password reset for {self.email}"
+
+class AdminCounter(models.Model):
+    """A running total shown on the admin dashboard, maintained by users.counters."""
+    name = models.CharField(max_length=50, primary_key=True)
+    value = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name} = {self.value}"
+
 @receiver(post_save, sender=User)
 def create_user_profile(sender, instance, created, **kwargs):
     if created and not instance.is_superuser:
@@ -0,0 +1,183 @@
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db import transaction
+from django.db.models import F, Q
+from django.template.loader import render_to_string
+from django.utils import timezone
+
+from .models import AdminDigestEntry, OutboundEmail
+
+logger = logging.getLogger(__name__)
+
+
+def queue_email(kind, subject, template_name, context, to, expires_at=None, sensitive=False):
+    """
+    Render ``template_name``.txt/.html and add the email to the outbox.
+
+    Rendering happens now so the worker never needs the original objects;
+    delivery happens in the ``send_outbox`` worker. An email still unsent at
+    ``expires_at`` is marked dead instead of sent late. The body of a
+    ``sensitive`` email is blanked once it is sent or dead.
+    """
+    return OutboundEmail.objects.create(
+        kind=kind,
+        subject=subject,
+        body=render_to_string(f'{template_name}.txt', context),
+        html_body=render_to_string(f'{template_name}.html', context),
+        from_email=settings.DEFAULT_FROM_EMAIL,
+        to=list(to),
+        max_attempts=settings.EMAIL_MAX_ATTEMPTS,
+        expires_at=expires_at,
+        sensitive=sensitive,
+    )
+
+
+def _finished(email, **changes):
+    """Fields to update when ``email`` leaves the outbox as sent or dead."""
+    changes['locked_at'] = None
+    if email.sensitive:
+        changes.update(body='', html_body='')
+    return changes
+
+
+def expire_emails(now, stale):
+    """Mark unsent emails past their ``expires_at`` dead, blanking sensitive bodies."""
+    # Emails being sent right now are left to finish
+    expired = OutboundEmail.objects.filter(
+        Q(status='pending') | Q(status='sending', locked_at__lt=stale), expires_at__lte=now
+    )
+    # Two statements so only sensitive bodies are blanked
+    count = expired.filter(sensitive=True).update(
+        status='dead', locked_at=None, last_error='Expired before delivery', body='', html_body=''
+    )
+    count += expired.update(status='dead', locked_at=None, last_error='Expired before delivery')
+    return count
+
+
+def claim_emails(limit):
+    """Mark up to ``limit`` due emails as sending and return them."""
+    now = timezone.now()
+    stale = now - timedelta(seconds=settings.EMAIL_LOCK_TIMEOUT)
+    expire_emails(now, stale)
+    with transaction.atomic():
+        emails = list(
+            OutboundEmail.objects.select_for_update(skip_locked=True)
+            .filter(Q(status='pending', send_after__lte=now) | Q(status='sending', locked_at__lt=stale))
+            .filter(Q(expires_at__isnull=True) | Q(expires_at__gt=now))
+            .order_by('send_after')[:limit]
+        )
+        if emails:
+            OutboundEmail.objects.filter(pk__in=[email.pk for email in emails]).update(
+                status='sending', locked_at=now, attempts=F('attempts') + 1
+            )
+    for email in emails:
+        email.status, email.locked_at = 'sending', now
+        email.attempts += 1
+    return emails
+
+
+def _build_message(email, connection):
+    message = EmailMultiAlternatives(
+        subject=email.subject,
+        body=email.body,
+        from_email=email.from_email,
+        to=email.to,
+        connection=connection,
+    )
+    if email.html_body:
+        message.attach_alternative(email.html_body, 'text/html')
+    return message
+
+
+def deliver(emails, connection=None):
+    """
+    Send claimed emails over one SMTP connection and record each outcome.
+
+    Messages go out one ``send_messages`` call at a time on the same open
+    connection, so a rejected recipient only fails its own email. Failures are
+    retried with a doubling delay and end up dead after ``max_attempts``.
+    Returns the number of emails sent.
+    """
+    if not emails:
+        return 0
+    own_connection = connection is None
+    connection = connection or get_connection()
+    sent = 0
+    try:
+        for email in emails:
+            try:
+                connection.send_messages([_build_message(email, connection)])
+            except Exception as e:
+                logger.warning('Could not send %s email %s: %s', email.kind, email.pk, e)
+                # The connection may be unusable now; the next send reopens it
+                connection.close()
+                _record_failure(email, e)
+            else:
+                OutboundEmail.objects.filter(pk=email.pk).update(
+                    **_finished(email, status='sent', sent_at=timezone.now(), last_error='')
+                )
+                sent += 1
+    finally:
+        if own_connection:
+            connection.close()
+    return sent
+
+
+def _record_failure(email, error):
+    if email.attempts >= email.max_attempts:
+        OutboundEmail.objects.filter(pk=email.pk).update(
+            **_finished(email, status='dead', last_error=str(error))
+        )
+        logger.error('Giving up on %s email %s after %s attempts', email.kind, email.pk, email.attempts)
+        return
+    delay = settings.EMAIL_RETRY_DELAY * 2 ** (email.attempts - 1)
+    OutboundEmail.objects.filter(pk=email.pk).update(
+        status='pending',
+        send_after=timezone.now() + timedelta(seconds=delay),
+        locked_at=None,
+        last_error=str(error),
+    )
+
+
+def deliver_pending(limit=None):
+    """Send everything that is due right now. Used by the test_* commands."""
+    return deliver(claim_emails(limit or settings.EMAIL_BATCH_SIZE))
+
+
+def queue_admin_digest(force=False):
+    """
+    Roll the signups waiting in AdminDigestEntry into one admin email.
+
+    Nothing is queued until the oldest entry is ADMIN_DIGEST_INTERVAL seconds
+    old, unless ``force`` is set. Returns the queued email or None.
+    """
+    cutoff = timezone.now() - timedelta(seconds=settings.ADMIN_DIGEST_INTERVAL)
+    with transaction.atomic():
+        entries = list(
+            AdminDigestEntry.objects.select_for_update(skip_locked=True)
+            .select_related('user')
+            .order_by('created_at')
+        )
+        if not entries or (not force and entries[0].created_at > cutoff):
+            return None
+
+        users = [entry.user for entry in entries]
+        email = queue_email(
+            'admin_digest',
+            f'New User Registrations: {len(users)}',
+            'users/emails/admin_digest',
+            {'users': users, 'site_name': 'Wahanayak', 'since': entries[0].created_at},
+            [settings.DEFAULT_FROM_EMAIL],
+        )
+        AdminDigestEntry.objects.filter(pk__in=[entry.pk for entry in entries]).delete()
+    return email
+
+
+def purge_sent(days=None):
+    """Delete sent emails older than EMAIL_RETENTION_DAYS."""
+    cutoff = timezone.now() - timedelta(days=days or settings.EMAIL_RETENTION_DAYS)
+    deleted, _ = OutboundEmail.objects.filter(status='sent', sent_at__lt=cutoff).delete()
+    return deleted
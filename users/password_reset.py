@@ -0,0 +1,57 @@
+"""
+Password reset codes.
+
+A code is emailed to the user and only its HMAC is stored, in a
+PasswordResetToken row keyed by the email the reset was requested for (the
+outbox blanks the email body once sent, see users.utils.send_otp_email). The
+address is kept in the session between the two steps, so checking a code is a
+single indexed lookup on (email, otp_hash) and a code can never match
+another user's.
+"""
+import secrets
+from datetime import timedelta
+
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.crypto import salted_hmac
+
+from .models import PasswordResetToken
+
+OTP_LIFETIME = timedelta(minutes=10)
+
+
+def _hash(otp):
+    return salted_hmac('users.password_reset', otp).hexdigest()
+
+
+def issue_otp(user):
+    """
+    Create a 6-digit code for ``user`` and return it. Any earlier code for
+    the same email stops working, and expired tokens are purged.
+    """
+    otp = str(100000 + secrets.randbelow(900000))
+    now = timezone.now()
+    with transaction.atomic():
+        PasswordResetToken.objects.filter(Q(email=user.email) | Q(expires_at__lte=now)).delete()
+        PasswordResetToken.objects.create(
+            user=user, email=user.email, otp_hash=_hash(otp), expires_at=now + OTP_LIFETIME
+        )
+    return otp
+
+
+def redeem_otp(email, otp):
+    """
+    Use up the code and return the id of the user it was issued to, or None
+    if it is wrong or expired.
+    """
+    # One statement: look the token up by (email, otp_hash) and delete it,
+    # so a code works once even when submitted twice at the same time
+    table = connection.ops.quote_name(PasswordResetToken._meta.db_table)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {table} WHERE email = %s AND otp_hash = %s AND expires_at > %s RETURNING user_id',
+            [email, _hash(otp), timezone.now()],
+        )
+        row = cursor.fetchone()
+    return row[0] if row else None
@@ -1,11 +1,12 @@
-from django.core.mail import send_mail
-from django.template.loader import render_to_string
-from django.conf import settings
-from django.contrib.auth.models import User
+from django.utils import timezone
+
+from .models import AdminDigestEntry
+from .outbox import queue_email
+from .password_reset import OTP_LIFETIME
 
 def send_welcome_email(user):
     """
-    Send a welcome email to newly registered users
+    Queue a welcome email for newly registered users
     """
     subject = 'Welcome to Wahanayak! 🚗'
     
@@ -17,56 +18,28 @@ def send_welcome_email(user):
         'site_url': 'https://wahanayak.lk',
     }
     
-    # Render the email template
-    html_message = render_to_string('users/emails/welcome_email.html', context)
-    plain_message = render_to_string('users/emails/welcome_email.txt', context)
-    
     try:
-        # Send the email
-        send_mail(
-            subject=subject,
-            message=plain_message,
-            from_email=settings.DEFAULT_FROM_EMAIL,
-            recipient_list=[user.email],
-            html_message=html_message,
-            fail_silently=False,
-        )
+        # Queue the email; the send_outbox worker delivers it
+        queue_email('welcome', subject, 'users/emails/welcome_email', context, [user.email])
         return True
     except Exception as e:
-        print(f"Error sending welcome email to {user.email}: {str(e)}")
+        print(f"Error queueing welcome email to {user.email}: {str(e)}")
         return False
 
 def send_admin_notification(user):
     """
-    Send notification to admin about new user registration
+    Add a new user registration to the next admin digest email
     """
-    subject = f'New User Registration: {user.username}'
-    
-    context = {
-        'user': user,
-        'site_name': 'Wahanayak',
-    }
-    
-    html_message = render_to_string('users/emails/admin_notification.html', context)
-    plain_message = render_to_string('users/emails/admin_notification.txt', context)
-    
     try:
-        send_mail(
-            subject=subject,
-            message=plain_message,
-            from_email=settings.DEFAULT_FROM_EMAIL,
-            recipient_list=[settings.DEFAULT_FROM_EMAIL],  # Send to admin email
-            html_message=html_message,
-            fail_silently=False,
-        )
+        AdminDigestEntry.objects.create(user=user)
         return True
     except Exception as e:
-        print(f"Error sending admin notification: {str(e)}")
+        print(f"Error recording admin notification: {str(e)}")
         return False
 
 def send_otp_email(user, otp):
     """
-    Send OTP email for password reset
+    Queue the OTP email for password reset
     """
     subject = 'Password Reset OTP - Wahanayak'
     
@@ -74,22 +47,16 @@ def send_otp_email(user, otp):
         'user': user,
         'otp': otp,
         'site_name': 'Wahanayak',
-        'expiry_minutes': 10,
+        'expiry_minutes': int(OTP_LIFETIME.total_seconds() // 60),
     }
     
-    html_message = render_to_string('users/emails/otp_email.html', context)
-    plain_message = render_to_string('users/emails/otp_email.txt', context)
-    
     try:
-        send_mail(
-            subject=subject,
-            message=plain_message,
-            from_email=settings.DEFAULT_FROM_EMAIL,
-            recipient_list=[user.email],
-            html_message=html_message,
-            fail_silently=False,
+        # Never sent after the code has expired, and not kept once sent
+        queue_email(
+            'otp', subject, 'users/emails/otp_email', context, [user.email],
+            expires_at=timezone.now() + OTP_LIFETIME, sensitive=True,
         )
         return True
     except Exception as e:
-        print(f"Error sending OTP email to {user.email}: {str(e)}")
-        return False 
\ No newline at end of file
+        print(f"Error queueing OTP email to {user.email}: {str(e)}")
+        return False
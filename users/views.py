@@ -3,14 +3,17 @@ from django.contrib import messages
 from django.contrib.auth.decorators import login_required, user_passes_test
 from .forms import CustomUserCreationForm, UserProfileForm, UserNameForm, ShopForm, PasswordResetRequestForm, OTPVerificationForm, NewPasswordForm
 from ads.models import Vehicle, Favorite
+from ads.cards import load_card_context
 from django.contrib.auth.models import User
 from django.db.models import Count
 from .models import UserProfile, Shop
+from .admin_search import search_users, search_vehicles
+from .counters import USERS, VEHICLE_COUNTERS, get_counters, vehicle_counter
+from .password_reset import issue_otp, redeem_otp
 from django.http import JsonResponse
 import json
 from datetime import datetime
 from django.utils import timezone
-from django.db.models import Q
 from django.urls import reverse
 from .utils import send_welcome_email, send_admin_notification, send_otp_email
 
@@ -113,20 +116,29 @@ def shop_setup(request):
 
 @login_required
 def my_ads(request):
-    pending_ads = Vehicle.objects.filter(user=request.user, status='pending').order_by('-created_at')
-    approved_ads = Vehicle.objects.filter(user=request.user, status='approved').order_by('-created_at')
-    rejected_ads = Vehicle.objects.filter(user=request.user, status='rejected').order_by('-created_at')
+    # Load the user's ads once with card data, then split them by status
+    user_ads = load_card_context(
+        Vehicle.objects.filter(user=request.user).order_by('-created_at'),
+        request.user
+    )
+    pending_ads = [vehicle for vehicle in user_ads if vehicle.status == 'pending']
+    approved_ads = [vehicle for vehicle in user_ads if vehicle.status == 'approved']
+    rejected_ads = [vehicle for vehicle in user_ads if vehicle.status == 'rejected']
+    expired_ads = [vehicle for vehicle in user_ads if vehicle.status == 'expired']
     
     return render(request, 'users/my_ads.html', {
         'pending_ads': pending_ads,
         'approved_ads': approved_ads,
-        'rejected_ads': rejected_ads
+        'rejected_ads': rejected_ads,
+        'expired_ads': expired_ads
     })
 
 @login_required
 def my_favorites(request):
-    favorites = Favorite.objects.filter(user=request.user).select_related('vehicle').prefetch_related('vehicle__images').order_by('-created_at')
-    favorite_vehicles = [favorite.vehicle for favorite in favorites if favorite.vehicle.status == 'approved']
+    favorites = Favorite.objects.filter(user=request.user).select_related('vehicle').order_by('-created_at')
+    favorite_vehicles = load_card_context(
+        [favorite.vehicle for favorite in favorites if favorite.vehicle.status == 'approved']
+    )
     
     return render(request, 'users/my_favorites.html', {
         'favorite_vehicles': favorite_vehicles
@@ -138,9 +150,11 @@ def admin_dashboard(request):
     section = request.GET.get('section', 'registered')  # Default to registered users
     search_query = request.GET.get('search', '')
     
-    total_users = User.objects.filter(is_superuser=False).count()
-    pending_ads = Vehicle.objects.filter(status='pending').count()
-    approved_ads = Vehicle.objects.filter(status='approved').count()
+    # Running totals kept by users.counters, read in one query
+    counters = get_counters()
+    total_users = counters[USERS]
+    pending_ads = counters[vehicle_counter('pending')]
+    approved_ads = counters[vehicle_counter('approved')]
     
     context = {
         'section': section,
@@ -157,21 +171,15 @@ def admin_dashboard(request):
         
         # Apply search if query exists
         if search_query:
-            users_query = users_query.filter(
-                Q(username__icontains=search_query) |
-                Q(first_name__icontains=search_query) |
-                Q(last_name__icontains=search_query) |
-                Q(email__icontains=search_query) |
-                Q(userprofile__contact_phone__icontains=search_query) |
-                Q(userprofile__whatsapp_number__icontains=search_query) |
-                Q(userprofile__unique_id__icontains=search_query) |
-                Q(shop__company_name__icontains=search_query)
-            ).distinct().select_related('shop')
+            users_query = search_users(users_query, search_query).select_related('shop')
         
         users_query = users_query.order_by('-date_joined')
         
         # Pagination for registered users
         paginator = Paginator(users_query, 40)  # Show 5 users per page
+        if not search_query:
+            # The counter already holds the total, skip the COUNT
+            paginator.count = total_users
         page_number = request.GET.get('page')
         page_obj = paginator.get_page(page_number)
         context['recent_users'] = [
@@ -195,22 +203,11 @@ def admin_dashboard(request):
         )
         # Apply search if query exists
         if search_query:
-            pending_query = pending_query.filter(
-                Q(ad_id__icontains=search_query) |
-                Q(make__icontains=search_query) |
-                Q(model__icontains=search_query) |
-                Q(location__icontains=search_query) |
-                Q(description__icontains=search_query) |
-                Q(vehicle_type__icontains=search_query) |
-                Q(user__username__icontains=search_query) |
-                Q(user__first_name__icontains=search_query) |
-                Q(user__last_name__icontains=search_query) |
-                Q(user__userprofile__unique_id__icontains=search_query) |
-                Q(phone_number__icontains=search_query) |
-                Q(whatsapp_number__icontains=search_query)
-            ).distinct()
+            pending_query = search_vehicles(pending_query, search_query)
         pending_query = pending_query.order_by('-created_at')
         paginator = Paginator(pending_query, 40)  # Show 40 ads per page
+        if not search_query:
+            paginator.count = pending_ads
         page_number = request.GET.get('page')
         page_obj = paginator.get_page(page_number)
         context['pending_vehicles'] = page_obj
@@ -224,22 +221,11 @@ def admin_dashboard(request):
         )
         # Apply search if query exists
         if search_query:
-            all_vehicles_query = all_vehicles_query.filter(
-                Q(ad_id__icontains=search_query) |
-                Q(make__icontains=search_query) |
-                Q(model__icontains=search_query) |
-                Q(location__icontains=search_query) |
-                Q(description__icontains=search_query) |
-                Q(vehicle_type__icontains=search_query) |
-                Q(user__username__icontains=search_query) |
-                Q(user__first_name__icontains=search_query) |
-                Q(user__last_name__icontains=search_query) |
-                Q(user__userprofile__unique_id__icontains=search_query) |
-                Q(phone_number__icontains=search_query) |
-                Q(whatsapp_number__icontains=search_query)
-            ).distinct()
+            all_vehicles_query = search_vehicles(all_vehicles_query, search_query)
         all_vehicles_query = all_vehicles_query.order_by('-created_at')
         paginator = Paginator(all_vehicles_query, 40)  # Show 40 ads per page
+        if not search_query:
+            paginator.count = sum(counters[name] for name in VEHICLE_COUNTERS)
         page_number = request.GET.get('page')
         page_obj = paginator.get_page(page_number)
         context['all_vehicles'] = page_obj
@@ -569,6 +555,7 @@ def shop_profile(request, user_id):
         user=shop_owner,
         status='approved'
     ).order_by('-created_at')
+    vehicles = load_card_context(vehicles, request.user)
     
     context = {
         'shop': shop,
@@ -584,12 +571,13 @@ def password_reset_request(request):
         form = PasswordResetRequestForm(request.POST)
         if form.is_valid():
             email = form.cleaned_data['email']
+            # The code is checked against this email in the next step
+            request.session['reset_email'] = email
             try:
                 user = User.objects.get(email=email)
-                profile = user.userprofile
                 
                 # Generate OTP
-                otp = profile.generate_otp()
+                otp = issue_otp(user)
                 
                 # Send OTP email
                 if send_otp_email(user, otp):
@@ -608,23 +596,26 @@ def password_reset_request(request):
 
 def otp_verification(request):
     """Step 2: User enters OTP for verification"""
+    email = request.session.get('reset_email')
+    if not email:
+        messages.error(request, 'Please request a password reset first.')
+        return redirect('users:password_reset_request')
+
     if request.method == 'POST':
         form = OTPVerificationForm(request.POST)
         if form.is_valid():
             otp = form.cleaned_data['otp']
             
-            # Find user with this OTP
-            try:
-                profile = UserProfile.objects.get(reset_otp=otp)
-                if profile.verify_otp(otp):
-                    # Store user_id in session for next step
-                    request.session['reset_user_id'] = profile.user.id
-                    messages.success(request, 'OTP verified successfully. Please enter your new password.')
-                    return redirect('users:new_password')
-                else:
-                    messages.error(request, 'Invalid or expired OTP. Please try again.')
-            except UserProfile.DoesNotExist:
-                messages.error(request, 'Invalid OTP. Please try again.')
+            # Look up and use up the OTP issued to this email
+            user_id = redeem_otp(email, otp)
+            if user_id:
+                # Store user_id in session for next step
+                request.session['reset_user_id'] = user_id
+                del request.session['reset_email']
+                messages.success(request, 'OTP verified successfully. Please enter your new password.')
+                return redirect('users:new_password')
+            else:
+                messages.error(request, 'Invalid or expired OTP. Please try again.')
     else:
         form = OTPVerificationForm()
     
@@ -651,9 +642,6 @@ def new_password(request):
             user.set_password(form.cleaned_data['password1'])
             user.save()
             
-            # Clear OTP
-            user.userprofile.clear_otp()
-            
             # Clear session
             if 'reset_user_id' in request.session:
                 del request.session['reset_user_id']
@@ -12,5 +12,9 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'vehicle_ads.settings')
+# Persistent connections belong to the thread that opened them and are not
+# closed reliably under ASGI. Unless told otherwise, connect per request
+# (ideally through PgBouncer).
+os.environ.setdefault('DB_POOL_MODE', 'direct')
 
 application = get_asgi_application()
@@ -12,6 +12,8 @@ https://docs.djangoproject.com/en/5.0/ref/settings/
 
 import os
 from pathlib import Path
+
+from django.core.exceptions import ImproperlyConfigured
 from dotenv import load_dotenv
 
 # Load environment variables from .env file
@@ -47,6 +49,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     
     # Third party apps
     'crispy_forms',
@@ -86,6 +89,7 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'ads.context_processors.listing_cache',
             ],
         },
     },
@@ -108,6 +112,41 @@ DATABASES = {
     }
 }
 
+# How connections are reused, picked with DB_POOL_MODE:
+#   persistent - each worker keeps its connection for DB_CONN_MAX_AGE seconds
+#                and checks it is alive before reusing it (WSGI workers)
+#   direct     - a new connection per request; use behind a PgBouncer in
+#                transaction mode together with DB_DISABLE_SERVER_SIDE_CURSORS
+DB_POOL_MODE = os.getenv('DB_POOL_MODE', 'persistent')
+if DB_POOL_MODE == 'persistent':
+    DATABASES['default']['CONN_MAX_AGE'] = int(os.getenv('DB_CONN_MAX_AGE', '60'))
+    DATABASES['default']['CONN_HEALTH_CHECKS'] = True
+elif DB_POOL_MODE == 'direct':
+    DATABASES['default']['CONN_MAX_AGE'] = 0
+else:
+    raise ImproperlyConfigured(f'Unknown DB_POOL_MODE {DB_POOL_MODE!r}.')
+DATABASES['default']['DISABLE_SERVER_SIDE_CURSORS'] = os.getenv('DB_DISABLE_SERVER_SIDE_CURSORS', 'False').lower() == 'true'
+
+
+# Cache
+# Local memory by default. Each process then invalidates only its own cached
+# listing pages; the others serve theirs until LISTING_CACHE_TIMEOUT. With
+# several workers, point CACHE_BACKEND/CACHE_LOCATION at a shared backend,
+# e.g. django.core.cache.backends.redis.RedisCache or, after
+# createcachetable, django.core.cache.backends.db.DatabaseCache.
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', 'wahanayak'),
+    }
+}
+
+# Seconds anonymous home/search pages are cached (signals invalidate earlier)
+LISTING_CACHE_TIMEOUT = int(os.getenv('LISTING_CACHE_TIMEOUT', '300'))
+# Set to False to serve the listing pages uncached, e.g. for several workers
+# sharing no cache
+LISTING_CACHE_ENABLED = os.getenv('LISTING_CACHE_ENABLED', 'True').lower() == 'true'
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
@@ -152,6 +191,14 @@ BUNNYCDN_STORAGE_ZONE_NAME = os.getenv('BUNNYCDN_STORAGE_ZONE_NAME')
 BUNNYCDN_API_KEY = os.getenv('BUNNYCDN_API_KEY')
 BUNNYCDN_REGION = os.getenv('BUNNYCDN_REGION', 'sg')  # Singapore region
 BUNNYCDN_PULL_ZONE_URL = os.getenv('BUNNYCDN_PULL_ZONE_URL')
+# HTTP client tuning for the storage API
+BUNNYCDN_POOL_SIZE = int(os.getenv('BUNNYCDN_POOL_SIZE', '10'))
+BUNNYCDN_CONNECT_TIMEOUT = float(os.getenv('BUNNYCDN_CONNECT_TIMEOUT', '5'))
+BUNNYCDN_READ_TIMEOUT = float(os.getenv('BUNNYCDN_READ_TIMEOUT', '60'))
+BUNNYCDN_MAX_RETRIES = int(os.getenv('BUNNYCDN_MAX_RETRIES', '3'))
+BUNNYCDN_RETRY_BACKOFF = float(os.getenv('BUNNYCDN_RETRY_BACKOFF', '0.5'))
+# Send a SHA-256 Checksum header so the storage API verifies each upload
+BUNNYCDN_SEND_CHECKSUM = os.getenv('BUNNYCDN_SEND_CHECKSUM', 'True').lower() == 'true'
 
 # Use Bunny.net storage for both development and production
 if BUNNYCDN_STORAGE_ZONE_NAME and BUNNYCDN_API_KEY and BUNNYCDN_PULL_ZONE_URL:
@@ -168,6 +215,31 @@ else:
 
 # File upload settings
 MAX_UPLOAD_SIZE = int(os.getenv('MAX_UPLOAD_SIZE', '5242880'))  # 5MB
+# Uploads are kept here until the run_jobs worker copies them to the media
+# storage, so it must be shared by the web and worker processes
+UPLOAD_STAGING_ROOT = os.getenv('UPLOAD_STAGING_ROOT', str(BASE_DIR / 'upload_staging'))
+
+# Background jobs (python manage.py run_jobs)
+JOB_MAX_ATTEMPTS = int(os.getenv('JOB_MAX_ATTEMPTS', '5'))
+JOB_RETRY_DELAY = int(os.getenv('JOB_RETRY_DELAY', '30'))  # seconds, doubled after each attempt
+JOB_LOCK_TIMEOUT = int(os.getenv('JOB_LOCK_TIMEOUT', '600'))  # running jobs older than this are retried
+
+# Deleted media files (python manage.py purge_storage)
+STORAGE_GC_BATCH_SIZE = int(os.getenv('STORAGE_GC_BATCH_SIZE', '200'))
+STORAGE_GC_WORKERS = int(os.getenv('STORAGE_GC_WORKERS', str(BUNNYCDN_POOL_SIZE)))
+STORAGE_GC_MAX_ATTEMPTS = int(os.getenv('STORAGE_GC_MAX_ATTEMPTS', '5'))
+STORAGE_GC_RETRY_DELAY = int(os.getenv('STORAGE_GC_RETRY_DELAY', '300'))  # seconds, doubled after each attempt
+STORAGE_GC_LOCK_TIMEOUT = int(os.getenv('STORAGE_GC_LOCK_TIMEOUT', '600'))  # claimed files are retried after this
+
+# Approved ads are marked expired this many days after posting (sweep_expirations)
+AD_LIFETIME_DAYS = int(os.getenv('AD_LIFETIME_DAYS', '30'))
+
+# Search results pagination
+SEARCH_PAGE_SIZE = int(os.getenv('SEARCH_PAGE_SIZE', '40'))
+# Show the planner's row estimate instead of running an exact COUNT(*)
+SEARCH_COUNT_ESTIMATE = os.getenv('SEARCH_COUNT_ESTIMATE', 'True').lower() == 'true'
+# Seconds the search filter facet counts are cached per filter set
+FACET_CACHE_TIMEOUT = int(os.getenv('FACET_CACHE_TIMEOUT', '60'))
 
 # Logging configuration for bunny storage
 LOGGING = {
@@ -211,6 +283,14 @@ EMAIL_USE_TLS = os.getenv('EMAIL_USE_TLS', 'True').lower() == 'true'
 EMAIL_HOST_USER = os.getenv('EMAIL_HOST_USER', '')
 EMAIL_HOST_PASSWORD = os.getenv('EMAIL_HOST_PASSWORD', '')
 DEFAULT_FROM_EMAIL = os.getenv('DEFAULT_FROM_EMAIL', EMAIL_HOST_USER)
+# Outbox worker (python manage.py send_outbox)
+EMAIL_MAX_ATTEMPTS = int(os.getenv('EMAIL_MAX_ATTEMPTS', '5'))
+EMAIL_RETRY_DELAY = int(os.getenv('EMAIL_RETRY_DELAY', '60'))  # seconds, doubled after each attempt
+EMAIL_BATCH_SIZE = int(os.getenv('EMAIL_BATCH_SIZE', '50'))
+EMAIL_LOCK_TIMEOUT = int(os.getenv('EMAIL_LOCK_TIMEOUT', '600'))  # emails stuck in sending are retried after this
+EMAIL_RETENTION_DAYS = int(os.getenv('EMAIL_RETENTION_DAYS', '30'))  # sent emails are deleted after this
+# New signups are reported to the admins in one digest at most this often
+ADMIN_DIGEST_INTERVAL = int(os.getenv('ADMIN_DIGEST_INTERVAL', '3600'))  # seconds
 
 # For local development, you can use:
 # EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
@@ -1,10 +1,118 @@
+import hashlib
+import logging
 import os
+import pathlib
+import threading
+import uuid
+from collections import Counter
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
 from django.core.files.storage import Storage
-from django.core.files.base import ContentFile
+from django.core.files.base import File
+from django.core.files.utils import validate_file_name
 from django.utils.deconstruct import deconstructible
 
+logger = logging.getLogger('bunny_storage')
+
+_session = None
+_session_lock = threading.Lock()
+
+# Storage API calls made by this process, keyed by HTTP method
+_request_counts = Counter()
+_request_counts_lock = threading.Lock()
+
+def _build_session():
+    """Create a requests session with a connection pool and retry policy for the storage API."""
+    retry = Retry(
+        total=settings.BUNNYCDN_MAX_RETRIES,
+        connect=settings.BUNNYCDN_MAX_RETRIES,
+        read=settings.BUNNYCDN_MAX_RETRIES,
+        status=settings.BUNNYCDN_MAX_RETRIES,
+        backoff_factor=settings.BUNNYCDN_RETRY_BACKOFF,
+        status_forcelist=(500, 502, 503, 504),
+        # Every storage API call is idempotent, PUT and DELETE included
+        allowed_methods=frozenset(['GET', 'HEAD', 'PUT', 'DELETE']),
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(
+        pool_connections=settings.BUNNYCDN_POOL_SIZE,
+        pool_maxsize=settings.BUNNYCDN_POOL_SIZE,
+        max_retries=retry,
+    )
+    session = requests.Session()
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+def get_session():
+    """Return the process-wide session shared by every BunnyStorage instance."""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = _build_session()
+    return _session
+
+def get_request_counts():
+    """Return a snapshot of the storage API calls made so far, by HTTP method."""
+    with _request_counts_lock:
+        return dict(_request_counts)
+
+def reset_request_counts():
+    with _request_counts_lock:
+        _request_counts.clear()
+
+def _sha256_hexdigest(content):
+    """Hash a file chunk by chunk, leaving it rewound."""
+    digest = hashlib.sha256()
+    for chunk in content.chunks():
+        digest.update(chunk)
+    content.seek(0)
+    return digest.hexdigest().upper()
+
+class BunnyFile(File):
+    """
+    Read-only file backed by a streaming GET.
+
+    Nothing is downloaded until the first read, and reads pull from the
+    socket in the requested sizes so memory use does not grow with the file.
+    """
+
+    def __init__(self, name, storage):
+        self.name = name
+        self.mode = 'rb'
+        self._storage = storage
+        self._response = None
+
+    @property
+    def file(self):
+        if self._response is None:
+            self._response = self._storage._get_stream(self.name)
+            self._response.raw.decode_content = True
+        return self._response.raw
+
+    @property
+    def size(self):
+        if self._response is not None and 'Content-Length' in self._response.headers:
+            return int(self._response.headers['Content-Length'])
+        return self._storage.size(self.name)
+
+    @property
+    def closed(self):
+        return self._response is None or self._response.raw.closed
+
+    def open(self, mode=None):
+        self.close()
+        return self
+
+    def close(self):
+        if self._response is not None:
+            self._response.close()
+            self._response = None
+
 @deconstructible
 class BunnyStorage(Storage):
     def __init__(self, location=None, base_url=None):
@@ -13,6 +121,7 @@ class BunnyStorage(Storage):
         self.storage_zone_name = settings.BUNNYCDN_STORAGE_ZONE_NAME
         self.api_key = settings.BUNNYCDN_API_KEY
         self.region = settings.BUNNYCDN_REGION or ''
+        self.timeout = (settings.BUNNYCDN_CONNECT_TIMEOUT, settings.BUNNYCDN_READ_TIMEOUT)
         
         # Construct the storage API URL
         if self.region:
@@ -20,65 +129,94 @@ class BunnyStorage(Storage):
         else:
             self.storage_url = f"https://storage.bunnycdn.com/{self.storage_zone_name}/"
 
+    @property
+    def session(self):
+        return get_session()
+
+    def _request(self, method, name, **kwargs):
+        """Send an authenticated storage API request for ``name`` and count it."""
+        headers = {'AccessKey': self.api_key, **kwargs.pop('headers', {})}
+        with _request_counts_lock:
+            _request_counts[method] += 1
+        return self.session.request(
+            method, f"{self.storage_url}{name}", headers=headers, timeout=self.timeout, **kwargs
+        )
+
+    def get_available_name(self, name, max_length=None):
+        """
+        Return a unique name without asking the storage API.
+
+        The default implementation calls exists() (a HEAD request) once per
+        candidate name. A random prefix makes collisions practically
+        impossible, so uploads go straight to the PUT.
+        """
+        name = str(name).replace("\\", "/")
+        dir_name, file_name = os.path.split(name)
+        if ".." in pathlib.PurePath(dir_name).parts:
+            raise SuspiciousFileOperation(f"Detected path traversal attempt in '{dir_name}'")
+        validate_file_name(file_name)
+        file_root, file_ext = os.path.splitext(file_name)
+        prefix = f"{uuid.uuid4().hex}_"
+
+        name = os.path.join(dir_name, f"{prefix}{file_root}{file_ext}")
+        if max_length and len(name) > max_length:
+            # Shorten the original name, never the random prefix
+            file_root = file_root[:len(file_root) - (len(name) - max_length)]
+            if not file_root:
+                raise SuspiciousFileOperation(
+                    f'Storage can not find an available filename for "{name}". '
+                    'Please make sure that the corresponding file field '
+                    'allows sufficient "max_length".'
+                )
+            name = os.path.join(dir_name, f"{prefix}{file_root}{file_ext}")
+        return name
+
     def _open(self, name, mode='rb'):
-        # For reading files, we'll redirect to the CDN URL
-        return ContentFile(self._read(name))
+        # Stream the object instead of loading it into memory
+        return BunnyFile(name, self)
 
-    def _read(self, name):
-        # Read file from bunny.net storage
-        url = f"{self.storage_url}{name}"
-        headers = {
-            'AccessKey': self.api_key,
-        }
-        response = requests.get(url, headers=headers)
+    def _get_stream(self, name):
+        """Start a streaming GET for ``name`` and return the open response."""
+        response = self._request('GET', name, stream=True)
         if response.status_code == 200:
-            return response.content
-        else:
-            raise FileNotFoundError(f"File {name} not found in bunny.net storage")
+            return response
+        response.close()
+        raise FileNotFoundError(f"File {name} not found in bunny.net storage")
 
     def _save(self, name, content):
         # Save file to bunny.net storage
-        url = f"{self.storage_url}{name}"
         headers = {
-            'AccessKey': self.api_key,
-            'Content-Type': getattr(content, 'content_type', 'application/octet-stream'),
+            'Content-Type': getattr(content, 'content_type', None) or 'application/octet-stream',
+            'Content-Length': str(content.size),
         }
-        
-        # Debug information
-        print(f"DEBUG: Uploading to {url}")
-        print(f"DEBUG: API Key: {self.api_key[:20]}...")
-        print(f"DEBUG: Storage Zone: {self.storage_zone_name}")
-        
+
+        if settings.BUNNYCDN_SEND_CHECKSUM:
+            # Bunny rejects the upload if the body does not match this SHA-256
+            headers['Checksum'] = _sha256_hexdigest(content)
+
         # Ensure the content is at the beginning
         if hasattr(content, 'seek'):
             content.seek(0)
-        
-        response = requests.put(url, data=content, headers=headers)
-        
-        print(f"DEBUG: Response status: {response.status_code}")
-        print(f"DEBUG: Response text: {response.text}")
-        
+
+        # Pass the underlying file so requests streams it from disk in blocks
+        body = getattr(content, 'file', None) or content
+        logger.debug("Uploading %s (%s bytes) to %s", name, content.size, self.storage_zone_name)
+        response = self._request('PUT', name, data=body, headers=headers)
+
         if response.status_code in [200, 201]:
             return name
         else:
+            logger.error("Failed to upload %s: %s - %s", name, response.status_code, response.text)
             raise Exception(f"Failed to upload file to bunny.net: {response.status_code} - {response.text}")
 
     def delete(self, name):
         # Delete file from bunny.net storage
-        url = f"{self.storage_url}{name}"
-        headers = {
-            'AccessKey': self.api_key,
-        }
-        response = requests.delete(url, headers=headers)
+        response = self._request('DELETE', name)
         return response.status_code in [200, 204]
 
     def exists(self, name):
         # Check if file exists in bunny.net storage
-        url = f"{self.storage_url}{name}"
-        headers = {
-            'AccessKey': self.api_key,
-        }
-        response = requests.head(url, headers=headers)
+        response = self._request('HEAD', name)
         return response.status_code == 200
 
     def url(self, name):
@@ -89,11 +227,7 @@ class BunnyStorage(Storage):
 
     def size(self, name):
         # Get file size from bunny.net storage
-        url = f"{self.storage_url}{name}"
-        headers = {
-            'AccessKey': self.api_key,
-        }
-        response = requests.head(url, headers=headers)
+        response = self._request('HEAD', name)
         if response.status_code == 200:
             return int(response.headers.get('Content-Length', 0))
         return 0
@@ -108,11 +242,7 @@ class BunnyStorage(Storage):
 
     def get_modified_time(self, name):
         # Get modification time from bunny.net storage
-        url = f"{self.storage_url}{name}"
-        headers = {
-            'AccessKey': self.api_key,
-        }
-        response = requests.head(url, headers=headers)
+        response = self._request('HEAD', name)
         if response.status_code == 200:
             from datetime import datetime
             last_modified = response.headers.get('Last-Modified')
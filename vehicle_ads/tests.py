@@ -0,0 +1,94 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+
+from django.core.files.base import ContentFile
+from django.test import SimpleTestCase, override_settings
+
+from . import storage
+
+
+class StubStorageHandler(BaseHTTPRequestHandler):
+    """Answers storage API uploads over keep-alive connections."""
+    protocol_version = 'HTTP/1.1'
+
+    def setup(self):
+        super().setup()
+        with self.server.lock:
+            self.server.connections += 1
+
+    def do_PUT(self):
+        self.rfile.read(int(self.headers['Content-Length']))
+        with self.server.lock:
+            self.server.uploads += 1
+        self.send_response(201)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+@override_settings(
+    BUNNYCDN_STORAGE_ZONE_NAME='zone',
+    BUNNYCDN_API_KEY='key',
+    BUNNYCDN_PULL_ZONE_URL='https://cdn.example.com',
+    BUNNYCDN_POOL_SIZE=4,
+    BUNNYCDN_MAX_RETRIES=0,
+)
+class BunnyStorageSessionTests(SimpleTestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), StubStorageHandler)
+        self.server.lock = threading.Lock()
+        self.server.connections = self.server.uploads = 0
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+
+        # Start from a fresh process-wide session built with the settings above
+        storage._session = None
+        self.addCleanup(setattr, storage, '_session', None)
+        self.storage = storage.BunnyStorage()
+        self.storage.storage_url = f'http://127.0.0.1:{self.server.server_port}/zone/'
+
+    def upload(self, index):
+        return self.storage._save(f'vehicle_images/{index}.jpg', ContentFile(b'x' * 1024))
+
+    def test_sequential_uploads_share_one_connection(self):
+        for index in range(100):
+            self.upload(index)
+        self.assertEqual(self.server.uploads, 100)
+        self.assertEqual(self.server.connections, 1)
+
+    def test_concurrent_uploads_stay_within_the_pool(self):
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            list(executor.map(self.upload, range(100)))
+        self.assertEqual(self.server.uploads, 100)
+        self.assertLessEqual(self.server.connections, 4)
+
+
+@override_settings(
+    BUNNYCDN_STORAGE_ZONE_NAME='zone',
+    BUNNYCDN_API_KEY='key',
+    BUNNYCDN_PULL_ZONE_URL='https://cdn.example.com',
+    BUNNYCDN_SEND_CHECKSUM=False,
+)
+class BunnyStorageSaveTests(SimpleTestCase):
+    def setUp(self):
+        self.session = mock.Mock()
+        self.session.request.return_value = mock.Mock(status_code=201)
+        get_session = mock.patch.object(storage, 'get_session', return_value=self.session)
+        get_session.start()
+        self.addCleanup(get_session.stop)
+
+    def test_save_only_uploads(self):
+        bunny = storage.BunnyStorage()
+        # The same name twice: get_available_name must not ask whether it exists
+        names = [bunny.save('vehicle_images/car.jpg', ContentFile(b'x' * 1024)) for _ in range(2)]
+
+        methods = [call.args[0] for call in self.session.request.call_args_list]
+        self.assertEqual(methods, ['PUT', 'PUT'])
+        self.assertNotEqual(names[0], names[1])
+        for name, call in zip(names, self.session.request.call_args_list):
+            self.assertEqual(call.args[1], f'{bunny.storage_url}{name}')